@@ -0,0 +1,211 @@
+"""
+Microbenchmark d'un pas de temps de cada esquema
+
+Compara els nuclis d'abans (expressions de NumPy que creen vectors temporals a cada pas)
+amb els generadors actuals (`itera_*`), que treballen sobre vectors reservats un sol cop.
+Per cada esquema mostra el temps per pas, la memòria temporal que es reserva en un pas
+(el pic que registra `tracemalloc`, que també veu les reserves de NumPy) i quantes operacions
+del pas reserven memòria (vectors temporals, buffers de NumPy, llistes de Python, ...).
+També compara els esquemes implícits avançant diversos escenaris junts i un per un.
+
+S'executa des de l'arrel del projecte (on hi ha `config.json`):
+
+    python -m benchmarks.pas_temps [N] [escenaris]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from heartless.configuracio import constants, constants_modificades
+from heartless.crank import itera_crank_nicolson
+from heartless.escenaris import estat_inicial, prepara_escenaris
+from heartless.explicit import itera_euler_explicit
+from heartless.implicit import itera_euler_implicit
+from heartless.tridiagonal import factoritzacio_esquema
+
+# Passos que es mesuren per cada esquema
+PASSOS = 2000
+# Passos que es mesuren amb tracemalloc (és lent)
+PASSOS_MEMORIA = 50
+# Passos on es compten les reserves, instrucció a instrucció (encara més lent)
+PASSOS_RESERVES = 5
+# Les reserves més petites (floats de Python, vistes, tuples) no compten
+MIDA_MINIMA_RESERVA = 512
+# Nombres d'escenaris que s'avancen junts i un per un, i passos que es mesuren
+ESCENARIS = (2, 4, 16, 64)
+PASSOS_ESCENARIS = 200
+
+
+def _iterador_abans(esquema, dx, dt, voltatge):
+    """Bucle amb els nuclis d'abans, que creen els vectors temporals a cada pas"""
+    T_c, font = prepara_escenaris(voltatge=voltatge)
+    T = estat_inicial(T_c)
+    T_seg = T.copy()
+    if esquema == "explicit":
+        r = dt / (dx**2)
+        while True:
+            T_seg[..., 1:-1] = (
+                r * (T[..., 2:] - 2 * T[..., 1:-1] + T[..., :-2]) + dt * font + T[..., 1:-1]
+            )
+            T, T_seg = T_seg, T
+            yield T
+    elif esquema == "implicit":
+        b = dt / (dx**2)
+        A = factoritzacio_esquema("implicit", constants.N, dx, dt)
+        while True:
+            c = T[..., 1:-1] + dt * font
+            c[..., :1] += b * T_c
+            c[..., -1:] += b * T_c
+            A.resol(c.T, out=T_seg[..., 1:-1].T)
+            T, T_seg = T_seg, T
+            yield T
+    else:
+        beta = dt / (2 * dx * dx)
+        A = factoritzacio_esquema("crank", constants.N, dx, dt)
+        while True:
+            B = (
+                beta * T[..., :-2]
+                + (1 - 2 * beta) * T[..., 1:-1]
+                + beta * T[..., 2:]
+                + dt * font
+            )
+            A.resol(B.T, out=T_seg[..., 1:-1].T)
+            T, T_seg = T_seg, T
+            yield T
+
+
+def _iterador_ara(esquema, dx, dt, voltatge):
+    itera = {
+        "explicit": itera_euler_explicit,
+        "implicit": itera_euler_implicit,
+        "crank": itera_crank_nicolson,
+    }[esquema]
+    for _, _, T in itera(dx, dt, voltatge=voltatge):
+        yield T
+
+
+class _ComptadorReserves:
+    """Funció de traça que compta les instruccions que reserven memòria
+
+    Després de cada instrucció de Python (i de les funcions de C que crida)
+    mira si el pic de `tracemalloc` ha pujat més de `MIDA_MINIMA_RESERVA` bytes
+    per sobre de la memòria que hi havia abans de la instrucció.
+    """
+
+    def __init__(self):
+        self.reserves = 0
+        self._actual = 0
+
+    def reinicia(self):
+        tracemalloc.reset_peak()
+        self._actual, _ = tracemalloc.get_traced_memory()
+
+    def __call__(self, frame, event, arg):
+        frame.f_trace_opcodes = True
+        _, pic = tracemalloc.get_traced_memory()
+        # L'esdeveniment "call" inclou la crida des de fora del bucle (next, settrace)
+        if event != "call" and pic - self._actual > MIDA_MINIMA_RESERVA:
+            self.reserves += 1
+        self.reinicia()
+        return self
+
+
+def mesura(
+    iterador,
+    passos=PASSOS,
+    passos_memoria=PASSOS_MEMORIA,
+    passos_reserves=PASSOS_RESERVES,
+):
+    """Temps per pas (en µs), memòria temporal reservada en un pas (en bytes) i reserves per pas
+
+    El temps és la mitjana de `passos` passos; la memòria és el pic més gran
+    (per sobre de la memòria ja reservada) de `passos_memoria` passos, i les reserves
+    són la mitjana de `passos_reserves` passos (veure `_ComptadorReserves`).
+    """
+    # Primer pas fora de la mesura (reserva dels vectors de treball)
+    next(iterador)
+
+    inici = time.perf_counter()
+    for _ in range(passos):
+        next(iterador)
+    temps_pas = (time.perf_counter() - inici) / passos * 1e6
+
+    tracemalloc.start()
+    pic = 0
+    for _ in range(passos_memoria):
+        actual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        next(iterador)
+        pic = max(pic, tracemalloc.get_traced_memory()[1] - actual)
+
+    comptador = _ComptadorReserves()
+    for _ in range(passos_reserves):
+        comptador.reinicia()
+        sys.settrace(comptador)
+        try:
+            next(iterador)
+        finally:
+            sys.settrace(None)
+    tracemalloc.stop()
+    return temps_pas, pic, comptador.reserves / passos_reserves
+
+
+def mesura_escenaris(esquema, dx, dt, escenaris, passos=PASSOS_ESCENARIS):
+    """Temps (en ms) d'avançar `escenaris` voltatges `passos` passos, tots junts i un per un"""
+    voltatges = np.linspace(30, 50, escenaris)
+    iteradors = [_iterador_ara(esquema, dx, dt, voltatges)]
+    iteradors += [_iterador_ara(esquema, dx, dt, v) for v in voltatges]
+    for iterador in iteradors:
+        next(iterador)
+
+    temps = []
+    for grup in (iteradors[:1], iteradors[1:]):
+        inici = time.perf_counter()
+        for iterador in grup:
+            for _ in range(passos):
+                next(iterador)
+        temps.append((time.perf_counter() - inici) * 1e3)
+    return tuple(temps)
+
+
+def main(N=None, escenaris=1):
+    canvis = {} if N is None else {"N": N}
+    # Allarguem `t_a` perquè els generadors no s'aturin abans d'hora
+    canvis["t_a"] = 1e6
+    with constants_modificades(**canvis):
+        dx = 1 / (constants.N - 1)
+        # Amb q = 0.49 els tres esquemes són estables
+        dt = 0.49 * dx * dx
+        voltatge = None
+        if escenaris > 1:
+            voltatge = np.linspace(30, 50, escenaris)
+
+        print(f"N = {constants.N}, escenaris = {escenaris}, {PASSOS} passos")
+        capcalera = f"{'Esquema':<10}{'':<7}{'µs/pas':>10}{'bytes/pas':>12}{'reserves/pas':>14}"
+        print(capcalera)
+        print("-" * len(capcalera))
+        for esquema in ("explicit", "implicit", "crank"):
+            for nom, iterador in (
+                ("abans", _iterador_abans),
+                ("ara", _iterador_ara),
+            ):
+                temps_pas, pic, reserves = mesura(iterador(esquema, dx, dt, voltatge))
+                print(f"{esquema:<10}{nom:<7}{temps_pas:>10.2f}{pic:>12}{reserves:>14.1f}")
+
+        print()
+        print(f"Escenaris junts i un per un, {PASSOS_ESCENARIS} passos")
+        capcalera = f"{'Esquema':<10}{'escenaris':>10}{'junts (ms)':>12}{'un per un (ms)':>16}"
+        print(capcalera)
+        print("-" * len(capcalera))
+        for esquema in ("implicit", "crank"):
+            for k in ESCENARIS:
+                junts, un_per_un = mesura_escenaris(esquema, dx, dt, k)
+                print(f"{esquema:<10}{k:>10}{junts:>12.1f}{un_per_un:>16.1f}")
+
+
+if __name__ == "__main__":
+    arguments = [int(a) for a in sys.argv[1:]]
+    main(*arguments)
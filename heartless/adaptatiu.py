@@ -0,0 +1,234 @@
+"""
+Pas de temps adaptatiu per Euler Implícit i Crank-Nicolson
+
+Els dos esquemes són incondicionalment estables, així que el dt només està limitat
+per la precisió. Al principi la temperatura canvia ràpidament i cal un dt petit,
+però a mesura que s'acosta a l'estat estacionari es pot fer molt més gran.
+
+L'error de cada pas s'estima per duplicació del pas (step doubling): es fa un pas
+amb dt i dos amb dt/2, i la diferència entre tots dos dividida per `2^p - 1`
+(p és l'ordre de l'esquema) és l'error local. Si supera la tolerància, el pas es
+rebutja i es torna a provar amb la meitat; si és prou petit, el següent dt es duplica.
+
+Els dt sempre són `dt_inicial * 2^k`, de manera que només hi ha unes poques matrius
+diferents i cada una es factoritza un sol cop (`factoritzacio_esquema` les guarda
+en memòria cau). Només es torna a factoritzar quan dt canvia a un valor nou.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.configuracio import constants, settings
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.escenaris import estat_inicial, prepara_escenaris
+from heartless.malla import dx_configurat, nombre_nodes, pas_minim
+from heartless.normalitzacio import desnormalitza_temperatura, normalitza_temperatura
+from heartless.teixit import font_nodes, operador, operador_constant, pesos_contorn
+from heartless.tridiagonal import factoritzacio_esquema
+
+# Ordre de precisió temporal de cada esquema
+ORDRE = {"implicit": 1, "crank": 2}
+
+# Nombre màxim de vegades que es pot dividir el dt inicial per 2
+MAX_DIVISIONS = 30
+
+
+@dataclass(frozen=True)
+class ResultatAdaptatiu:
+    """Resultat d'una execució amb pas adaptatiu
+
+    Attributes
+    ----------
+    temps : np.ndarray
+        Temps normalitzat de cada fila (no uniforme)
+    temperatures : np.ndarray
+        Temperatures normalitzades (passos acceptats x N)
+    rebutjats : int
+        Passos rebutjats per superar la tolerància
+    factoritzacions : int
+        Nombre de dt diferents utilitzats (matrius factoritzades)
+    """
+
+    temps: np.ndarray
+    temperatures: np.ndarray
+    rebutjats: int
+    factoritzacions: int
+
+    @property
+    def passos(self) -> int:
+        return len(self.temps) - 1
+
+
+def pas_esquema(esquema: str, T: np.ndarray, dx, dt, T_c, font, out: np.ndarray):
+    """Un pas de temps de l'esquema des de `T`, escrit a `out` (els extrems no canvien)
+
+    Són les mateixes equacions que `itera_euler_implicit` i `itera_crank_nicolson`,
+    però per un dt qualsevol i partint de qualsevol estat.
+    `dx` també pot ser les posicions d'una malla no uniforme (veure `heartless.malla`),
+    i el teixit pot ser heterogeni (veure `heartless.teixit`).
+    """
+    A = factoritzacio_esquema(esquema, T.shape[-1], dx, dt)
+    if esquema == "implicit":
+        b_esq, b_dret = pesos_contorn(dx, dt)
+        indep = T[..., 1:-1] + dt * font * font_nodes(dx)
+        indep[..., :1] += b_esq * T_c
+        indep[..., -1:] += b_dret * T_c
+    elif esquema == "crank" and operador_constant(dx):
+        beta = dt / (2 * dx * dx)
+        indep = (
+            beta * T[..., :-2]
+            + (1 - 2 * beta) * T[..., 1:-1]
+            + beta * T[..., 2:]
+            + dt * font
+        )
+    elif esquema == "crank":
+        esq, centre, dreta, font_node = operador(dx)
+        indep = (
+            dt / 2 * esq * T[..., :-2]
+            + (1 + dt / 2 * centre) * T[..., 1:-1]
+            + dt / 2 * dreta * T[..., 2:]
+            + dt * font * font_node
+        )
+    else:
+        raise ValueError(f"Esquema desconegut: '{esquema}'")
+
+    out[..., 0] = T[..., 0]
+    out[..., -1] = T[..., -1]
+    # El sistema va per l'eix 0, per això transposem si hi ha escenaris
+    A.resol(indep.T, out=out[..., 1:-1].T)
+    return out
+
+
+def itera_adaptatiu(
+    esquema: str, dx, dt_inicial, tolerancia=None, t_cos=None, voltatge=None, estat=None
+):
+    """Generador dels passos acceptats amb pas adaptatiu fins a `t_a`
+
+    Parameters
+    ----------
+    esquema : str
+        "implicit" (Euler Implícit) o "crank" (Crank-Nicolson)
+    dx : float
+        Increment de posició normalitzat
+    dt_inicial : float
+        Primer dt que es prova (normalitzat)
+    tolerancia : float, optional
+        Error local màxim per pas, en ºC (per defecte `settings.tolerancia_adaptativa`)
+    t_cos, voltatge : optional
+        Escenaris, com a `itera_euler_implicit`
+    estat : dict, optional
+        Si es dona, s'hi guarden els comptadors "rebutjats" i "dts" (dt utilitzats)
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Pas, temps normalitzat i temperatures normalitzades (el vector es reutilitza)
+    """
+    if tolerancia is None:
+        tolerancia = settings.tolerancia_adaptativa
+    tol = normalitza_temperatura(tolerancia)
+    divisor = 2 ** ORDRE[esquema] - 1
+    if estat is None:
+        estat = {}
+    estat["rebutjats"] = 0
+    estat["dts"] = set()
+
+    T_c, font = prepara_escenaris(t_cos, voltatge)
+    T = estat_inicial(T_c, nombre_nodes(dx))
+    gran, mig, fi = T.copy(), T.copy(), T.copy()
+    yield 0, 0.0, T
+
+    t = 0.0
+    i = 0
+    nivell = 0
+    # Marge per no fer un últim pas minúscul per errors d'arrodoniment
+    t_final = constants.t_a * (1 - 1e-12)
+    while t < t_final:
+        dt = dt_inicial * 2.0**nivell
+        ultim = t + dt >= t_final
+        if ultim:
+            dt = constants.t_a - t
+
+        pas_esquema(esquema, T, dx, dt, T_c, font, gran)
+        pas_esquema(esquema, T, dx, dt / 2, T_c, font, mig)
+        pas_esquema(esquema, mig, dx, dt / 2, T_c, font, fi)
+        error = np.max(np.abs(fi - gran)) / divisor
+        estat["dts"].update((dt, dt / 2))
+
+        if error > tol and nivell > -MAX_DIVISIONS:
+            # Rebutgem el pas i el tornem a provar amb la meitat
+            estat["rebutjats"] += 1
+            nivell = min(nivell, int(np.floor(np.log2(dt / dt_inicial)))) - 1
+            continue
+
+        T, fi = fi, T
+        t = constants.t_a if ultim else t + dt
+        i += 1
+        yield i, t, T
+
+        # L'error local creix com dt^(p+1): si amb el doble encara es compleix, dupliquem
+        if error * 2 ** (ORDRE[esquema] + 1) < 0.5 * tol:
+            nivell += 1
+
+
+def metode_adaptatiu(
+    esquema: str, dx, dt_inicial, tolerancia=None, t_cos=None, voltatge=None
+) -> ResultatAdaptatiu:
+    """Executa un esquema amb pas adaptatiu i guarda tots els passos acceptats
+
+    Returns
+    -------
+    ResultatAdaptatiu
+        Temps (no uniformes) i temperatures normalitzades de cada pas acceptat
+    """
+    estat = {}
+    temps, files = [], []
+    for _, t, T in itera_adaptatiu(
+        esquema, dx, dt_inicial, tolerancia, t_cos, voltatge, estat
+    ):
+        temps.append(t)
+        # El generador reutilitza els vectors, per tant els copiem
+        files.append(T.copy())
+    return ResultatAdaptatiu(
+        np.array(temps, dtype=np.float64),
+        np.array(files, dtype=np.float64),
+        estat["rebutjats"],
+        len(estat["dts"]),
+    )
+
+
+def executa_sequencia_adaptativa(context=None):
+    """Executa Euler Implícit i Crank-Nicolson amb pas adaptatiu i guarda els resultats
+
+    Es comença amb el dt més petit de cada mètode (`dt = q * dx^2`) i es guarden
+    com `<fitxer>_adaptatiu`, amb els temps de cada fila a les metadades.
+    """
+    print("Executant mètodes amb pas adaptatiu")
+    dx = dx_configurat()
+    h = pas_minim(dx)
+    for esquema, fitxer, llista_q in (
+        ("implicit", settings.fitxer_implicit, constants.T_implicit),
+        ("crank", settings.fitxer_crank, constants.T_crank),
+    ):
+        q = min(llista_q)
+        dt = q * h * h
+        result = metode_adaptatiu(esquema, dx, dt)
+        print(
+            f"{esquema}: {result.passos} passos ({int(constants.t_a // dt)} amb dt fix), "
+            f"{result.rebutjats} rebutjats, {result.factoritzacions} factoritzacions"
+        )
+
+        metadades = metadades_resultat(esquema, dt, q, result.temps)
+        metadades["adaptatiu"] = {
+            "tolerancia": settings.tolerancia_adaptativa,
+            "passos": result.passos,
+            "rebutjats": result.rebutjats,
+        }
+        fitxer = f"{fitxer}_adaptatiu"
+        T = desnormalitza_temperatura(result.temperatures)
+        if context is not None:
+            context.afegeix(fitxer, T, metadades)
+        else:
+            guardar_resultat(T, len(T), fitxer, metadades)
+    print("Pas adaptatiu finalitzat")
@@ -1,7 +1,189 @@
+from collections import OrderedDict
+from dataclasses import astuple
+from functools import lru_cache
+
 import numpy as np
 
-from heartless.configuracio import constants
-from heartless.normalitzacio import desnormalitza_distancia, desnormalitza_temperatura
+from heartless.configuracio import constants, settings
+from heartless.normalitzacio import (
+    desnormalitza_distancia,
+    desnormalitza_temperatura,
+    normalitza_temperatura,
+)
+from heartless.utils import arrel_brent, calcula_divisions, limits_teixit
+
+# Nombre màxim d'elements de les matrius temporals (temps x termes) i (temps x N)
+# Limita la memòria quan es demanen molts temps a la vegada
+MAX_ELEMENTS_BLOC = 2**22
+
+# Nombre màxim de perfils (un per temps) que es guarden a la memòria cau de referència
+MIDA_CAU_REFERENCIA = 4096
+
+
+@lru_cache(maxsize=8)
+def taula_modes(n: int, n_termes: int) -> np.ndarray:
+    """Taula (termes x posicions) amb `sin((2i+1) pi x) / (2i+1)^3` per la malla uniforme de `n` punts
+
+    Es guarda en memòria cau perquè no canvia entre crides
+    """
+    x_arr = np.linspace(0, 1, n, dtype=np.float64)
+    modes = _calcula_modes(x_arr, n_termes)
+    modes.flags.writeable = False
+    return modes
+
+
+def _calcula_modes(x_arr: np.ndarray, n_termes: int) -> np.ndarray:
+    k = 2 * np.arange(n_termes, dtype=np.float64) + 1
+    return np.sin(np.pi * np.outer(k, x_arr)) / (k**3)[:, np.newaxis]
+
+
+def _suma_exponencials(temps, modes, signe=1.0, max_elements=MAX_ELEMENTS_BLOC):
+    """Calcula `sum_i f_i(t) * modes[i]` per tots els temps, per blocs
+
+    Si `signe` és 1, `f_i(t) = exp(-(2i+1)^2 pi^2 t)`, si és -1, `f_i(t) = 1 - exp(...)`
+    """
+    n_termes, n = modes.shape
+    k = 2 * np.arange(n_termes, dtype=np.float64) + 1
+    k2pi2 = k**2 * np.pi**2
+
+    resultat = np.empty((len(temps), n), dtype=np.float64)
+    files_bloc = max(1, max_elements // (n_termes + n))
+    for ini in range(0, len(temps), files_bloc):
+        t_bloc = temps[ini : ini + files_bloc]
+        if signe > 0:
+            coef = np.exp(-np.outer(t_bloc, k2pi2))
+        else:
+            coef = -np.expm1(-np.outer(t_bloc, k2pi2))
+        np.matmul(coef, modes, out=resultat[ini : ini + files_bloc])
+    return resultat
+
+
+def _calcula_fxt_temps(temps, lim_sum, t_cos, max_elements=MAX_ELEMENTS_BLOC):
+    """Calcula la sèrie analítica per tots els temps, sense passar per la memòria cau"""
+    # Treballem amb temperatura normalitzada (per aixo el límit és 1)
+    # Equació trobada: sumatori de (1 - exp(-(2i+1)^2 pi^2 t)) sin((2i+1) pi x) / (2i+1)^3
+    # (als nodes de la malla configurada, si no és la uniforme)
+    if settings.malla == "uniforme":
+        modes = taula_modes(constants.N, lim_sum)
+    else:
+        modes = _calcula_modes(calcula_divisions(), lim_sum)
+    T = _suma_exponencials(temps, modes, signe=-1.0, max_elements=max_elements)
+    T *= 4 / (np.pi**3)
+    # Desnormalitzem el resultat final per treballar amb resultats amb significat físic
+    return t_cos + desnormalitza_temperatura(T)
+
+
+class CauReferencia:
+    """Memòria cau LRU dels perfils analítics, un per temps
+
+    La clau és (t, t_cos, N, constants, malla, termes del sumatori), així que el mateix perfil
+    només es calcula una vegada per procés encara que el demanin diverses gràfiques,
+    i qualsevol canvi de constants (per exemple amb `constants_modificades`) dona una clau nova.
+    Quan es demanen molts temps a la vegada, només es calculen els que falten, tots junts.
+
+    Parameters
+    ----------
+    mida_maxima : int
+        Nombre màxim de perfils guardats; s'esborren els utilitzats fa més temps
+    """
+
+    def __init__(self, mida_maxima: int = MIDA_CAU_REFERENCIA):
+        self.mida_maxima = mida_maxima
+        self._perfils: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self.encerts = 0
+        self.errades = 0
+
+    @staticmethod
+    def clau_constants(t_cos: float, lim_sum: int) -> tuple:
+        """Part de la clau comuna a tots els temps d'una crida"""
+        # Les llistes del JSON no són hashables, la representació en text sí
+        malla = repr((settings.malla, settings.malla_amplada, settings.malla_intensitat))
+        return (float(t_cos), constants.N, repr(astuple(constants)), malla, lim_sum)
+
+    def perfils(
+        self, temps, lim_sum: int, t_cos: float, max_elements: int = MAX_ELEMENTS_BLOC
+    ) -> np.ndarray:
+        """Matriu de temperatures (temps x N) en ºC, calculant només els temps que falten"""
+        comuna = self.clau_constants(t_cos, lim_sum)
+        claus = [(t,) + comuna for t in temps.tolist()]
+        falten = {}
+        for i, clau in enumerate(claus):
+            if clau not in self._perfils and clau not in falten:
+                falten[clau] = i
+        self.errades += len(falten)
+        self.encerts += len(claus) - len(falten)
+
+        nous = {}
+        if falten:
+            T_nous = _calcula_fxt_temps(
+                temps[list(falten.values())], lim_sum, t_cos, max_elements
+            )
+            nous = dict(zip(falten, T_nous))
+
+        resultat = np.empty((len(claus), constants.N), dtype=np.float64)
+        for i, clau in enumerate(claus):
+            if clau in nous:
+                resultat[i] = nous[clau]
+            else:
+                resultat[i] = self._perfils[clau]
+                self._perfils.move_to_end(clau)
+
+        for clau, perfil in nous.items():
+            perfil.flags.writeable = False
+            self._perfils[clau] = perfil
+        while len(self._perfils) > self.mida_maxima:
+            self._perfils.popitem(last=False)
+        return resultat
+
+    def neteja(self) -> None:
+        self._perfils.clear()
+
+    def informe(self) -> str:
+        total = self.encerts + self.errades
+        percentatge = 100 * self.encerts / total if total else 0.0
+        return (
+            f"Referència analítica: {self.encerts} encerts, {self.errades} errades "
+            f"({percentatge:.0f}% d'encerts)"
+        )
+
+
+cau_referencia = CauReferencia()
+
+
+def fxt_temps(
+    temps, lim_sum: int = 300, t_cos=None, max_elements: int = MAX_ELEMENTS_BLOC
+):
+    """Calcula la funció analítica per diversos temps normalitzats a la vegada
+
+    El sumatori es calcula com un producte de matrius:
+    (temps x termes) @ (termes x posicions), sense cap bucle de Python sobre x.
+    Els temps es processen per blocs perquè cap matriu temporal superi `max_elements`.
+    Els perfils ja calculats en aquest procés es llegeixen de `cau_referencia`.
+
+    Parameters
+    ----------
+    temps : array_like
+        Temps normalitzats (escalar o llista)
+    lim_sum : int
+        Nombre de termes del sumatori, pot fer variar la precisió
+    t_cos : float, optional
+        Temperatura del cos en ºC (per defecte 36.5)
+    max_elements : int
+        Mida màxima dels blocs temporals
+
+    Returns
+    -------
+    npt.NDArray[np.float64], npt.NDArray[np.float64]
+        Posicions x (desnormalitzades) i matriu de temperatures (temps x N)
+    """
+    temps = np.atleast_1d(np.asarray(temps, dtype=np.float64))
+    if t_cos is None:
+        b = 36.5
+    else:
+        b = t_cos
+    x_arr = calcula_divisions()
+    T = cau_referencia.perfils(temps, lim_sum, b, max_elements)
+    return desnormalitza_distancia(x_arr), T
 
 
 def fxt_t_determinat(t: float, lim_sum: int = 300,t_cos=None):
@@ -17,22 +199,166 @@ def fxt_t_determinat(t: float, lim_sum: int = 300,t_cos=None):
     npt.NDArray[np.float64], npt.NDArray[np.float64]
         Resultat per totes les x (normalitzades) en el t donat
     """
-    T_list = []
-    if t_cos is None:
-        b = 36.5
-    else:
-        b = t_cos
-    # Treballem amb temperatura normalitzada (per aixo el límit és 1)
-    x_arr = np.linspace(0, 1, constants.N, dtype=np.float64)
-    for x in x_arr:
-        sum = 0
-        # `lim_sum` és el límit del sumatori, pot fer variar la presició
-        for i in range(lim_sum):
-            # Equació trobada
-            sum = sum + (
-                (1 - np.exp(-((2 * i + 1) ** 2) * (np.pi) ** 2 * t)) / (2 * i + 1) ** 3
-            ) * (np.sin((2 * i + 1) * np.pi * x))
-        T_variable = b + desnormalitza_temperatura((4 / (np.pi**3)) * sum)
-        T_list.append(T_variable)
-    # Desnormalitzem el resultat final per treballar amb resultats amb significat físic
-    return desnormalitza_distancia(x_arr), np.array(T_list, dtype=np.float64)
+    x, T = fxt_temps(t, lim_sum, t_cos)
+    return x, T[0]
+
+
+class SolucioAnalitica:
+    """Solució analítica de referència amb truncament adaptatiu
+
+    Separem la solució en la part estacionària, que té forma tancada,
+    i la part transitòria, que és l'única que cal sumar:
+
+    `u(x,t) = x(1-x)/2 - 4/pi^3 * sum_i exp(-(2i+1)^2 pi^2 t) sin((2i+1) pi x) / (2i+1)^3`
+
+    Els termes decauen com `exp(-(2i+1)^2 pi^2 t) / (2i+1)^3`, així que el residu
+    a partir del terme M està fitat per `exp(-(2M+1)^2 pi^2 t) / (4 (2M-1)^2)`.
+    Amb aquesta cota escollim el nombre de termes per cada bloc de temps segons la tolerància.
+    La taula de modes (sinus) es calcula un sol cop per malla i només creix si cal.
+
+    Parameters
+    ----------
+    tolerancia : float
+        Error de truncament màxim admès, en ºC
+    t_cos : float, optional
+        Temperatura del cos en ºC (per defecte 36.5, com `fxt_t_determinat`)
+    x : np.ndarray, optional
+        Posicions normalitzades (per defecte la malla uniforme de `constants.N` punts)
+    max_termes : int
+        Límit de termes del sumatori (per temps molt propers a 0)
+    """
+
+    def __init__(
+        self,
+        tolerancia: float = 1e-8,
+        t_cos=None,
+        x: np.ndarray | None = None,
+        max_termes: int = 100_000,
+    ):
+        self.tolerancia = tolerancia
+        self.t_cos = 36.5 if t_cos is None else t_cos
+        if x is None:
+            x = np.linspace(0, 1, constants.N, dtype=np.float64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.max_termes = max_termes
+        self._modes = np.empty((0, len(self.x)), dtype=np.float64)
+
+    def cota_truncament(self, t: float, n_termes: int) -> float:
+        """Cota superior (en ºC) de l'error de truncar la sèrie a `n_termes` termes"""
+        M = max(n_termes, 1)
+        cota = np.exp(-((2 * M + 1) ** 2) * np.pi**2 * t) / (4 * (2 * M - 1) ** 2)
+        return float(desnormalitza_temperatura(4 / np.pi**3 * cota))
+
+    def termes_necessaris(self, t: float) -> int:
+        """Menor nombre de termes tal que la cota de truncament sigui menor que la tolerància"""
+        tol = normalitza_temperatura(self.tolerancia) * np.pi**3 / 4
+        # Treballem amb logaritmes per evitar que l'exponencial sigui 0:
+        # cal `(2M+1)^2 pi^2 t + log(4 (2M-1)^2) >= L`, i els dos sumands són positius i creixents
+        L = -np.log(tol)
+
+        def compleix(M: int) -> bool:
+            return (2 * M + 1) ** 2 * np.pi**2 * t + np.log(4 * (2 * M - 1) ** 2) >= L
+
+        # Si un sol sumand ja arriba a L, la cota es compleix: la menor de les dues solucions
+        # (tancades) de cada sumand per separat és una cota superior de M
+        M = (np.exp(L / 2) / 2 + 1) / 2
+        if t > 0:
+            M = min(M, (np.sqrt(max(L, 0.0) / (np.pi**2 * t)) - 1) / 2)
+        superior = max(int(np.ceil(min(M, self.max_termes))), 1)
+        if not compleix(superior):
+            return self.max_termes
+
+        # La cota és monòtona en M: cerca binària del primer M que la compleix
+        inferior = 0
+        while superior - inferior > 1:
+            mig = (inferior + superior) // 2
+            if compleix(mig):
+                superior = mig
+            else:
+                inferior = mig
+        return superior
+
+    def modes(self, n_termes: int) -> np.ndarray:
+        """Taula de modes amb almenys `n_termes` files (la fa créixer si cal)"""
+        if n_termes > len(self._modes):
+            # Creixem per potències de 2 per no recalcular la taula a cada crida
+            nova_mida = max(n_termes, 2 * len(self._modes), 16)
+            self._modes = _calcula_modes(self.x, min(nova_mida, self.max_termes))
+        return self._modes[:n_termes]
+
+    def avalua(self, temps, max_elements: int = MAX_ELEMENTS_BLOC):
+        """Temperatura de referència per tots els temps normalitzats donats
+
+        Els temps es processen ordenats, per blocs, i el nombre de termes de cada bloc
+        s'escull pel seu temps més petit, que és el que en necessita més.
+        A `t = 0` el transitori és igual a l'estacionari i el resultat és exacte (`t_cos`).
+
+        Returns
+        -------
+        npt.NDArray[np.float64], npt.NDArray[np.float64], float
+            Posicions x (desnormalitzades), matriu de temperatures (temps x N)
+            i cota de l'error de truncament en ºC
+        """
+        temps = np.atleast_1d(np.asarray(temps, dtype=np.float64))
+        n = len(self.x)
+        estacionari = self.x * (1 - self.x) / 2
+        T = np.empty((len(temps), n), dtype=np.float64)
+        cota = 0.0
+
+        ordre = np.argsort(temps, kind="stable")
+        inici = int(np.searchsorted(temps[ordre], 0.0, side="right"))
+        # A t = 0 (o abans) la temperatura és la del cos a tot arreu
+        T[ordre[:inici]] = 0.0
+        while inici < len(ordre):
+            t_bloc = float(temps[ordre[inici]])
+            n_termes = self.termes_necessaris(t_bloc)
+            files_bloc = max(1, max_elements // (n_termes + n))
+            index = ordre[inici : inici + files_bloc]
+            transitori = _suma_exponencials(
+                temps[index], self.modes(n_termes), max_elements=max_elements
+            )
+            T[index] = estacionari - 4 / np.pi**3 * transitori
+            cota = max(cota, self.cota_truncament(t_bloc, n_termes))
+            inici += files_bloc
+
+        return (
+            desnormalitza_distancia(self.x),
+            self.t_cos + desnormalitza_temperatura(T),
+            cota,
+        )
+
+
+def troba_temps_limit(
+    t_min: float,
+    t_max: float,
+    tol: float = 1e-10,
+    referencia: SolucioAnalitica | None = None,
+):
+    """Temps normalitzat en què la solució analítica supera per primer cop els límits del teixit
+
+    Busca l'arrel de `max_x (T(x, t) - limit(x))` a [t_min, t_max] amb el mètode de Brent.
+    Com que la temperatura creix amb el temps, aquesta funció és creixent.
+
+    Parameters
+    ----------
+    t_min, t_max : float
+        Interval de temps normalitzat on buscar
+    tol : float
+        Tolerància (en temps normalitzat)
+    referencia : SolucioAnalitica, optional
+        Solució analítica a utilitzar (per defecte `SolucioAnalitica()`)
+
+    Returns
+    -------
+    float | None
+        El temps límit, o None si no hi ha cap creuament a l'interval
+    """
+    if referencia is None:
+        referencia = SolucioAnalitica()
+    limits = limits_teixit(len(referencia.x))
+
+    def exces(t):
+        _, T, _ = referencia.avalua(t)
+        return float(np.max(T[0] - limits))
+
+    return arrel_brent(exces, t_min, t_max, tol=tol)
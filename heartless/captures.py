@@ -0,0 +1,119 @@
+"""
+Política de captures (snapshots) dels mètodes numèrics
+
+Els mètodes avancen sempre amb el dt demanat, però només guarden les files
+que indica la política. Així la memòria depèn del nombre de captures
+i no del nombre d'iteracions temporals.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.configuracio import constants
+
+
+@dataclass(frozen=True)
+class Captures:
+    """Quines iteracions temporals es guarden
+
+    Per defecte es guarden totes (el comportament original dels mètodes).
+
+    Attributes
+    ----------
+    cada : int
+        Guarda una iteració de cada `cada` (la inicial i la final sempre es guarden)
+    temps : tuple[float, ...], optional
+        Temps normalitzats que es volen guardar (s'agafa la iteració més propera)
+    nomes_final : bool
+        Guarda només l'estat final, a `t_a`
+    """
+
+    cada: int = 1
+    temps: tuple[float, ...] | None = None
+    nomes_final: bool = False
+
+    def indexs(self, iteracions: int, dt: float) -> np.ndarray:
+        """Índexs (ordenats i sense repetir) de les iteracions que cal guardar"""
+        if self.nomes_final:
+            return np.array([iteracions - 1], dtype=np.int64)
+
+        if self.temps is not None:
+            if len(self.temps) == 0:
+                raise ValueError("`temps` ha de tenir almenys un temps")
+            idx = np.rint(np.asarray(self.temps, dtype=np.float64) / dt)
+            idx = np.clip(idx, 0, iteracions - 1).astype(np.int64)
+            return np.unique(idx)
+
+        if self.cada < 1:
+            raise ValueError(f"`cada` ha de ser >= 1, no {self.cada}")
+        idx = np.arange(0, iteracions, self.cada, dtype=np.int64)
+        if idx[-1] != iteracions - 1:
+            idx = np.append(idx, iteracions - 1)
+        return idx
+
+
+def nombre_iteracions(dt: float) -> int:
+    """Nombre d'iteracions (incloent la inicial) per arribar a `constants.t_a`"""
+    return int(constants.t_a // dt) + 1
+
+
+def temps_captures(dt: float, captures: Captures | None = None) -> np.ndarray:
+    """Temps normalitzats de cada fila que retorna un mètode amb la política donada"""
+    if captures is None:
+        captures = Captures()
+    return captures.indexs(nombre_iteracions(dt), dt) * dt
+
+
+def filtra_captures(iterador, dt: float, captures: Captures | None = None):
+    """Deixa passar només les iteracions de la política de captures
+
+    Quan ja ha passat l'última captura, deixa d'iterar (i atura el mètode).
+
+    Parameters
+    ----------
+    iterador : Iterator[tuple[int, float, np.ndarray]]
+        Generador d'un mètode (`itera_euler_explicit`, `itera_euler_implicit`...)
+    dt : float
+        Increment de temps normalitzat
+    captures : Captures, optional
+        Política de captures (per defecte totes les iteracions)
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Iteració, temps normalitzat i temperatures
+    """
+    if captures is None:
+        captures = Captures()
+    indexs = captures.indexs(nombre_iteracions(dt), dt)
+
+    fila = 0
+    for i, t, T in iterador:
+        if i == indexs[fila]:
+            yield i, t, T
+            fila += 1
+            if fila == len(indexs):
+                break
+
+
+def recull_captures(iterador, dt: float, captures: Captures | None = None):
+    """Guarda en una matriu les captures demanades d'un generador de mètode
+
+    Returns
+    -------
+    np.ndarray
+        Matriu (captures x N) amb les temperatures guardades,
+        o (captures x escenaris x N) si el mètode avança diversos escenaris
+    """
+    if captures is None:
+        captures = Captures()
+    n_files = len(captures.indexs(nombre_iteracions(dt), dt))
+
+    resultat = None
+    for fila, (_, _, T) in enumerate(filtra_captures(iterador, dt, captures)):
+        if resultat is None:
+            resultat = np.empty((n_files,) + T.shape, dtype=np.float64)
+        # Els generadors reutilitzen els vectors, per tant els copiem
+        resultat[fila] = T
+    return resultat
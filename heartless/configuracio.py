@@ -1,4 +1,5 @@
 import json
+from contextlib import contextmanager
 from dataclasses import dataclass, fields
 from typing import Any, Dict
 
@@ -12,6 +13,14 @@ class Constants:
     CONDUCTIVITAT: float = 0.472
     L: float = 0.02
     l_mal:float = 0.005
+    # Propietats del teixit malalt, None si són les mateixes que el sa (veure `heartless.teixit`)
+    K_mal: float | None = None
+    RHO_mal: float | None = None
+    C_V_mal: float | None = None
+    CONDUCTIVITAT_mal: float | None = None
+    # Variació relativa de K i CONDUCTIVITAT per ºC respecte T_COS (veure `heartless.newton`)
+    ALFA_K: float = 0.0
+    ALFA_CONDUCTIVITAT: float = 0.0
     VOLTATGE: float = 40.0
     T_COS: float = 36.5
     N: int = 101
@@ -30,6 +39,31 @@ class Settings:
     fitxer_implicit: str = "implicit"
     fitxer_crank: str = "crank"
     temps_plot: tuple[float, ...] = (1.0,)
+    # Es guarda una iteració temporal de cada `captures_cada` (la final sempre)
+    captures_cada: int = 1
+    # Format dels resultats: "npy" (binari amb memòria mapejada) o "csv"
+    format_dades: str = "npy"
+    # Memòria cau dels resultats (veure `heartless.memoria_cau`)
+    usa_cache: bool = True
+    cache_path: str = ".cache"
+    cache_mida_mb: float = 512.0
+    # Pas de temps adaptatiu per Euler Implícit i Crank-Nicolson (veure `heartless.adaptatiu`)
+    dt_adaptatiu: bool = False
+    # Error local màxim per pas en ºC
+    tolerancia_adaptativa: float = 1e-3
+    # Extrapolació de Richardson d'Euler Implícit i Crank-Nicolson (veure `heartless.richardson`)
+    richardson: bool = False
+    # Malla: "uniforme", "graduada" o una llista de posicions en metres (veure `heartless.malla`)
+    malla: str | tuple[float, ...] = "uniforme"
+    # Amplada normalitzada i intensitat dels agrupaments de la malla graduada
+    malla_amplada: float = 0.05
+    malla_intensitat: float = 4.0
+    # Euler Implícit i Crank-Nicolson amb K i CONDUCTIVITAT dependents de la temperatura (veure `heartless.newton`)
+    newton: bool = False
+    # Residu màxim de les iteracions de Newton en ºC
+    tolerancia_newton: float = 1e-9
+    # Reutilitza el jacobià factoritzat mentre les iteracions convergeixin ràpid
+    jacobia_retardat: bool = False
     show_grafiques: bool = True
 
 
@@ -84,3 +118,27 @@ def carrega_configuracio(json_path: str) -> tuple[Settings, Constants]:
 
 
 settings, constants = carrega_configuracio("config.json")
+
+
+@contextmanager
+def constants_modificades(**canvis):
+    """Canvia temporalment alguns camps de `constants` i els restaura en sortir
+
+    Tots els mòduls comparteixen la mateixa instància de `constants`,
+    així que els canvis afecten tots els mètodes mentre dura el bloc `with`.
+
+    Exemple: `with constants_modificades(N=201, VOLTATGE=30.0): ...`
+    """
+    noms_camps = {camp.name for camp in fields(Constants)}
+    for nom in canvis:
+        if nom not in noms_camps:
+            raise ValueError(f"Constant desconeguda: '{nom}'")
+
+    anteriors = {nom: getattr(constants, nom) for nom in canvis}
+    for nom, valor in canvis.items():
+        setattr(constants, nom, valor)
+    try:
+        yield constants
+    finally:
+        for nom, valor in anteriors.items():
+            setattr(constants, nom, valor)
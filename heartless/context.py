@@ -0,0 +1,70 @@
+"""
+Context d'una execució: resultats en memòria compartits entre càlculs i gràfiques
+
+Els mètodes hi deixen els seus resultats i totes les gràfiques els llegeixen d'aquí,
+sense tornar a passar pel disc. Els resultats només s'escriuen un cop, amb `guarda`.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.emmagatzematge import carregar_resultat, guardar_resultat
+
+
+@dataclass(frozen=True)
+class ResultatMetode:
+    """Resultat d'un mètode guardat en memòria
+
+    Attributes
+    ----------
+    x : np.ndarray
+        Posicions en metres
+    temperatures : np.ndarray
+        Matriu de temperatures en ºC (captures x N)
+    metadades : dict | None
+        Metadades de `metadades_resultat` (None si s'ha llegit d'un CSV antic)
+    """
+
+    x: np.ndarray
+    temperatures: np.ndarray
+    metadades: dict | None = None
+
+
+class ContextExecucio:
+    """Resultats de l'execució, indexats pel nom del fitxer (per exemple "explicit_0.25")"""
+
+    def __init__(self):
+        self.resultats: dict[str, ResultatMetode] = {}
+        self._pendents: list[str] = []
+
+    def afegeix(self, fitxer: str, temperatures: np.ndarray, metadades: dict) -> None:
+        """Guarda en memòria un resultat calculat (s'escriurà al disc amb `guarda`)"""
+        x = np.asarray(metadades["x"], dtype=np.float64)
+        self.resultats[fitxer] = ResultatMetode(x, temperatures, metadades)
+        if fitxer not in self._pendents:
+            self._pendents.append(fitxer)
+
+    def obte(self, fitxer: str) -> tuple[np.ndarray, np.ndarray]:
+        """Posicions i temperatures d'un resultat
+
+        Si no s'ha calculat en aquesta execució, es llegeix de `dades/` una sola vegada
+        i es queda en memòria per les següents crides.
+        """
+        if fitxer not in self.resultats:
+            x, T = carregar_resultat(fitxer)
+            self.resultats[fitxer] = ResultatMetode(x, T)
+        resultat = self.resultats[fitxer]
+        return resultat.x, resultat.temperatures
+
+    def guarda(self) -> None:
+        """Escriu al disc els resultats calculats que encara no s'havien guardat"""
+        for fitxer in self._pendents:
+            resultat = self.resultats[fitxer]
+            guardar_resultat(
+                resultat.temperatures,
+                len(resultat.temperatures),
+                fitxer,
+                resultat.metadades,
+            )
+        self._pendents = []
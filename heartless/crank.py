@@ -1,62 +1,171 @@
 import numpy as np
 
+from heartless.captures import (
+    Captures,
+    nombre_iteracions,
+    recull_captures,
+    temps_captures,
+)
 from heartless.configuracio import constants, settings
-from heartless.normalitzacio import desnormalitza_temperatura, normalitza_temperatura
-from heartless.utils import gauss_pivotatge, guardar_matriu
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.escenaris import estat_inicial, interior_pla, nodes_interiors_pla
+from heartless.malla import dx_configurat, nombre_nodes, pas_minim
+from heartless.memoria_cau import memoria_cau
+from heartless.normalitzacio import desnormalitza_temperatura
+from heartless.protocol import FontProtocol, prepara_protocol
+from heartless.teixit import operador, operador_constant
+from heartless.tridiagonal import factoritzacio_esquema
 
 
-def crank_nicolson(dx, dt,t_cos=None):
-    if t_cos is None:
-        t_cos = constants.T_COS
-    iteracions = int(constants.t_a // dt) + 1
+def itera_crank_nicolson(dx, dt, t_cos=None, voltatge=None):
+    """Generador del mètode de Crank-Nicolson, iteració a iteració fins a `t_a`
+
+    Només utilitza dos vectors de treball (l'actual i el següent) que es van intercanviant.
+    El vector que es retorna es reutilitza en les iteracions següents:
+    s'ha de copiar si es vol guardar.
+
+    Si `t_cos` o `voltatge` són llistes, avança tots els escenaris a la vegada
+    i les temperatures són una matriu (escenaris x N) (veure `prepara_escenaris`).
+    `voltatge` també pot ser un protocol que canvia amb el temps (veure `heartless.protocol`).
+    Si `dx` és un array, són les posicions d'una malla no uniforme (veure `heartless.malla`),
+    i si el teixit malalt té propietats diferents, els coeficients són els de `heartless.teixit`.
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Iteració, temps normalitzat i temperatures normalitzades
+    """
+    if not operador_constant(dx):
+        yield from _itera_crank_nicolson_variable(dx, dt, t_cos, voltatge)
+        return
+
+    t_cos, font, escala = prepara_protocol(t_cos, voltatge, dt, "crank")
 
     beta = dt / (2 * dx * dx)
 
-    # Temperatura amb condicions de contorn
-    T = np.zeros((iteracions, constants.N), dtype=np.float64)
-
-    # Creem la matriu tridiagonal A
-    diagonal_principal = 1 + 2 * beta
-    diagonal_offset = -beta
-    # El tamany és 2 menys que T per les condicions de contorn
-    A = np.zeros((constants.N - 2, constants.N - 2), dtype=np.float64)
-    for i in range(len(A)):
-        A[i, i] = diagonal_principal
-        if i != 0:
-            A[i - 1, i] = diagonal_offset
-        if i != len(A) - 1:
-            A[i + 1, i] = diagonal_offset
-
-    # Els extrems (inicial i final) són diferents
-    A[0, 0] -= beta
-    A[-1, -1] -= beta
-
-    for i in range(1, iteracions):
+    # Matriu tridiagonal A factoritzada un sol cop (els extrems són diferents)
+    A = factoritzacio_esquema("crank", constants.N, dx, dt)
+
+    # Treballem directament amb la temperatura (extrems a T_COS) en lloc de desplaçar-la
+    # per T_COS (extrems a 0). Cada fila de A i de B suma 1, així que sumar una constant
+    # no canvia el resultat; l'únic canvi és que el terme de contorn `beta * T_ant[0]`
+    # (que desplaçat valia 0) no s'ha d'afegir a B.
+    T_ant = estat_inicial(t_cos)
+    T_seg = T_ant.copy()
+    yield 0, 0.0, T_ant
+
+    # Terme independent B i un vector auxiliar, reservats un sol cop amb la mida de T:
+    # es calculen sobre les vistes aplanades (1D contigües) i `B` és la part interior.
+    # Totes les vistes es creen abans del bucle, que només fa operacions in situ (`out=`)
+    # i no reserva memòria (amb diversos escenaris, el sistema es resol a `treball`)
+    W = np.empty_like(T_ant)
+    B_pla, B_sistema = W.reshape(-1)[1:-1], W[..., 1:-1].T
+    aux = np.empty_like(B_pla)
+    a = FontProtocol(interior_pla(dt * font, T_ant.shape), escala, T_ant.shape)
+    treball = None if T_ant.ndim == 1 else np.empty(B_sistema.shape)
+
+    def vistes(T):
+        pla = T.reshape(-1)
+        return pla[:-2], pla[1:-1], pla[2:], T[..., 1:-1].T
+
+    ant, seg = vistes(T_ant), vistes(T_seg)
+    for i in range(1, nombre_iteracions(dt)):
         # Fórmula trobada teòricament
-        B = (
-            beta * T[i - 1, :-2]
-            + (1 - 2 * beta) * T[i - 1, 1:-1]
-            + beta * T[i - 1, 2:]
-            + dt
-        )
-        # Les condicions de contorn canvien els extrems
-        B[0] += T[i - 1, 0] * beta
-        B[-1] += T[i - 1, -1] * beta
+        # beta T[j-1] + (1 - 2 beta) T[j] + beta T[j+1] + dt * font, en el mateix ordre de sempre
+        esq, centre, dreta, _ = ant
+        np.multiply(esq, beta, out=B_pla)
+        np.multiply(centre, 1 - 2 * beta, out=aux)
+        np.add(B_pla, aux, out=B_pla)
+        np.multiply(dreta, beta, out=aux)
+        np.add(B_pla, aux, out=B_pla)
+        np.add(B_pla, a(i), out=B_pla)
+
+        # El sistema va per l'eix 0, per això transposem si hi ha escenaris
+        A.resol(B_sistema, out=seg[3], treball=treball)
+        T_ant, T_seg = T_seg, T_ant
+        ant, seg = seg, ant
+        yield i, i * dt, T_ant
 
-        T[i, 1:-1] = gauss_pivotatge(A, B)
-    return T + normalitza_temperatura(t_cos)
 
+def _itera_crank_nicolson_variable(dx, dt, t_cos=None, voltatge=None):
+    """`itera_crank_nicolson` amb un pes diferent per cada node (malla o teixit no uniformes)
 
-def executa_sequencia_crank_nicolson():
+    B = T[j] + (dt / 2) (esq T[j-1] + centre T[j] + dreta T[j+1]) + dt * font,
+    amb la matriu `I - (dt / 2) L` i els extrems tractats com amb els coeficients constants.
+    B es calcula sobre els vectors aplanats, com amb els coeficients constants.
+    """
+    t_cos, font, escala = prepara_protocol(t_cos, voltatge, dt, "crank")
+    n = nombre_nodes(dx)
+    esq, centre, dreta, font_node = operador(dx)
+
+    A = factoritzacio_esquema("crank", n, dx, dt)
+
+    T_ant = estat_inicial(t_cos, n)
+    T_seg = T_ant.copy()
+    yield 0, 0.0, T_ant
+
+    forma = T_ant.shape
+    pes_esq, pes_centre, pes_dreta = (
+        nodes_interiors_pla(pes, forma)
+        for pes in (dt / 2 * esq, 1 + dt / 2 * centre, dt / 2 * dreta)
+    )
+    a = FontProtocol(nodes_interiors_pla(dt * font * font_node, forma), escala, forma)
+    W = np.empty_like(T_ant)
+    B_pla, B_sistema = W.reshape(-1)[1:-1], W[..., 1:-1].T
+    aux = np.empty_like(B_pla)
+    treball = None if T_ant.ndim == 1 else np.empty(B_sistema.shape)
+
+    def vistes(T):
+        pla = T.reshape(-1)
+        return pla[:-2], pla[1:-1], pla[2:], T[..., 1:-1].T
+
+    ant, seg = vistes(T_ant), vistes(T_seg)
+    for i in range(1, nombre_iteracions(dt)):
+        esq, centre, dreta, _ = ant
+        np.multiply(esq, pes_esq, out=B_pla)
+        np.multiply(centre, pes_centre, out=aux)
+        np.add(B_pla, aux, out=B_pla)
+        np.multiply(dreta, pes_dreta, out=aux)
+        np.add(B_pla, aux, out=B_pla)
+        np.add(B_pla, a(i), out=B_pla)
+
+        # El sistema va per l'eix 0, per això transposem si hi ha escenaris
+        A.resol(B_sistema, out=seg[3], treball=treball)
+        T_ant, T_seg = T_seg, T_ant
+        ant, seg = seg, ant
+        yield i, i * dt, T_ant
+
+
+def crank_nicolson(
+    dx, dt, t_cos=None, captures: Captures | None = None, voltatge=None
+):
+    # Temperatura amb condicions de contorn, només les files de la política de captures
+    return recull_captures(itera_crank_nicolson(dx, dt, t_cos, voltatge), dt, captures)
+
+
+def executa_sequencia_crank_nicolson(context=None):
     """Executa i guarda multiples instàncies del mètode de Crank-Nicolson per diferents dt
 
     Utilitza dt = q * dx^2 on q és una constant donada per les constants del programa
     """
     print("Executant Crank-Nicolson")
     for q in constants.T_implicit:
-        dx = 1 / (constants.N - 1)
-        dt = dx * dx * q
-        result = crank_nicolson(dx, dt)
-        result = desnormalitza_temperatura(result)
-        guardar_matriu(result, f"{settings.fitxer_crank}_{q}")
+        dx = dx_configurat()
+        # En una malla no uniforme, dt el limita la distància més petita entre nodes
+        h = pas_minim(dx)
+        dt = h * h * q
+        # Si ja s'havia calculat amb les mateixes constants, el llegim de la memòria cau
+        captures = Captures(cada=settings.captures_cada)
+        result = memoria_cau.resultat_metode(
+            "crank", crank_nicolson, dx, dt, captures=captures
+        )
+        fitxer = f"{settings.fitxer_crank}_{q}"
+        metadades = metadades_resultat("crank", dt, q, temps_captures(dt, captures))
+        if context is not None:
+            # Es queda en memòria per les gràfiques, el context el guardarà al final
+            context.afegeix(fitxer, desnormalitza_temperatura(result), metadades)
+        else:
+            guardar_resultat(
+                desnormalitza_temperatura(result), len(result), fitxer, metadades
+            )
     print("Crank-Nicolson finalitzat")
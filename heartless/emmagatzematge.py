@@ -0,0 +1,160 @@
+"""
+Emmagatzematge binari dels resultats
+
+Cada resultat es guarda com a `dades/<fitxer>.npy` (matriu de temperatures en binari)
+i `dades/<fitxer>.json` (metadades: posicions x, temps de cada fila, dt, q, mètode i constants).
+El `.npy` s'obre amb memòria mapejada, de manera que les gràfiques només llegeixen
+del disc les files que necessiten.
+
+El format CSV es pot seguir fent servir amb `settings.format_dades = "csv"`
+o exportant un resultat ja guardat amb `exporta_csv`.
+"""
+
+import json
+import os
+from dataclasses import asdict
+
+import numpy as np
+
+from heartless.configuracio import constants, settings
+from heartless.normalitzacio import desnormalitza_distancia, normalitza_distancia
+from heartless.utils import (
+    MatriuCSV,
+    calcula_divisions,
+    carregar_posicions_temperatures,
+    guardar_files,
+    guardar_matriu,
+)
+
+
+def _directori_fitxer(fitxer: str, extensio: str) -> str:
+    return os.path.join(os.getcwd(), settings.dades_path, fitxer + extensio)
+
+
+def metadades_resultat(metode: str, dt: float, q: float, temps=None, x=None) -> dict:
+    """Metadades que acompanyen un resultat
+
+    Parameters
+    ----------
+    metode : str
+        Nom del mètode ("explicit", "implicit", "crank"...)
+    dt : float
+        Increment de temps normalitzat
+    q : float
+        Relació `dt = q * dx^2`
+    temps : array_like, optional
+        Temps normalitzat de cada fila guardada
+    x : array_like, optional
+        Posicions normalitzades dels nodes (per defecte la malla de `calcula_divisions`)
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "metode": metode,
+        "dt": dt,
+        "q": q,
+        "x": desnormalitza_distancia(calcula_divisions() if x is None else x).tolist(),
+        "temps": None if temps is None else np.asarray(temps, dtype=np.float64).tolist(),
+        "constants": asdict(constants),
+    }
+
+
+def guardar_resultat(files, n_files: int, fitxer: str, metadades: dict) -> None:
+    """Guarda un resultat fila a fila, en binari (per defecte) o en CSV segons `settings.format_dades`
+
+    Les files s'escriuen a mesura que arriben, sense tenir mai la matriu sencera en memòria.
+
+    Parameters
+    ----------
+    files : Iterable[np.ndarray]
+        Files de temperatures (també pot ser una matriu)
+    n_files : int
+        Nombre de files que es guardaran
+    fitxer : str
+        Nom del fitxer sense extensió
+    metadades : dict
+        Metadades de `metadades_resultat`
+    """
+    if settings.format_dades == "csv":
+        guardar_files(files, fitxer, normalitza_distancia(np.asarray(metadades["x"])))
+        return
+
+    directori_carpeta = os.path.join(os.getcwd(), settings.dades_path)
+    try:
+        os.makedirs(directori_carpeta, exist_ok=True)
+    except OSError as e:
+        print(f"Error creant el directori: {e}")
+        return
+
+    try:
+        matriu = np.lib.format.open_memmap(
+            _directori_fitxer(fitxer, ".npy"),
+            mode="w+",
+            dtype=np.float64,
+            shape=(n_files, len(metadades["x"])),
+        )
+        for i, fila in enumerate(files):
+            matriu[i] = fila
+        matriu.flush()
+        del matriu
+
+        with open(_directori_fitxer(fitxer, ".json"), "w") as f:
+            json.dump(metadades, f, indent=2)
+        print("Guardat correctament")
+    except (OSError, ValueError) as e:
+        print(f"Error inesperat: {e}")
+
+
+def carregar_metadades(fitxer: str) -> dict | None:
+    """Llegeix les metadades d'un resultat binari, None si no n'hi ha"""
+    directori = _directori_fitxer(fitxer, ".json")
+    if not os.path.exists(directori):
+        return None
+    with open(directori, "r") as f:
+        return json.load(f)
+
+
+def carregar_resultat(fitxer: str) -> tuple[np.ndarray, np.ndarray]:
+    """Obre un resultat (sense extensió de la carpeta de dades)
+
+    Si existeix la versió binària, la matriu s'obre amb memòria mapejada (només lectura)
+    i només es llegeixen del disc les files que s'utilitzen.
+    Si no, obre el CSV amb `obre_csv`, que també llegeix només les files que s'utilitzen.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Posicions x (en metres) i matriu de temperatures
+    """
+    directori = _directori_fitxer(fitxer, ".npy")
+    metadades = carregar_metadades(fitxer)
+    if not os.path.exists(directori) or metadades is None:
+        return obre_csv(fitxer)
+
+    try:
+        matriu = np.load(directori, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        print(f" Error al llegir la matriu: {e}")
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+
+    return np.array(metadades["x"], dtype=np.float64), matriu
+
+
+def obre_csv(fitxer: str) -> tuple[np.ndarray, np.ndarray | MatriuCSV]:
+    """Obre un CSV de `dades/` sense llegir-ne les files (ho fa `MatriuCSV` quan s'indexa)"""
+    directori = _directori_fitxer(fitxer, ".csv")
+    if not os.path.exists(directori):
+        return carregar_posicions_temperatures(fitxer)
+
+    with open(directori, "r") as f:
+        pos_x = np.array(f.readline().strip().split(","), dtype=np.float64)
+    return pos_x, MatriuCSV(fitxer)
+
+
+def exporta_csv(fitxer: str) -> None:
+    """Exporta a CSV (amb el format de `guardar_matriu`) un resultat guardat en binari"""
+    x, matriu = carregar_resultat(fitxer)
+    # Les posicions són les de la malla amb què es va calcular, no les de la configuració actual
+    guardar_matriu(np.asarray(matriu), fitxer, normalitza_distancia(x))
@@ -0,0 +1,97 @@
+"""
+Escenaris múltiples (voltatges i temperatures del cos) en una sola execució
+
+Tots els mètodes treballen amb la temperatura normalitzada amb `constants.VOLTATGE`.
+Un escenari amb un altre voltatge V només canvia la font de calor, que passa a ser
+`(V / constants.VOLTATGE)^2`, i una altra temperatura del cos només canvia els extrems.
+Per tant, tots els escenaris comparteixen la mateixa matriu (i factorització)
+i es poden avançar a la vegada com una matriu (escenaris x N).
+"""
+
+import numpy as np
+
+from heartless.configuracio import constants
+from heartless.normalitzacio import normalitza_temperatura
+
+
+def prepara_escenaris(t_cos=None, voltatge=None):
+    """Temperatura dels extrems (normalitzada) i font de calor de cada escenari
+
+    `t_cos` i `voltatge` poden ser escalars o llistes (amb la mateixa mida o una d'elles escalar).
+    Si tots dos són escalars, el resultat és escalar i els mètodes treballen amb un vector,
+    com sempre.
+
+    Parameters
+    ----------
+    t_cos : float | array_like, optional
+        Temperatura del cos en ºC (per defecte constants.T_COS)
+    voltatge : float | array_like, optional
+        Voltatge aplicat en V (per defecte constants.VOLTATGE)
+
+    Returns
+    -------
+    tuple[float | np.ndarray, float | np.ndarray]
+        Temperatura dels extrems i font de calor, escalars o de forma (escenaris, 1)
+    """
+    if callable(voltatge) or (
+        isinstance(voltatge, (list, tuple)) and any(callable(v) for v in voltatge)
+    ):
+        raise ValueError(
+            "Només Euler Explícit, Euler Implícit i Crank-Nicolson admeten protocols de voltatge "
+            "(veure `heartless.protocol`)"
+        )
+    if t_cos is None:
+        t_cos = constants.T_COS
+    if voltatge is None:
+        voltatge = constants.VOLTATGE
+    t_cos = np.asarray(t_cos, dtype=np.float64)
+    voltatge = np.asarray(voltatge, dtype=np.float64)
+
+    T_c = normalitza_temperatura(t_cos)
+    font = (voltatge / constants.VOLTATGE) ** 2
+    if t_cos.ndim == 0 and voltatge.ndim == 0:
+        return float(T_c), float(font)
+
+    T_c, font = np.broadcast_arrays(np.ravel(T_c), np.ravel(font))
+    return T_c[:, np.newaxis].copy(), font[:, np.newaxis].copy()
+
+
+def estat_inicial(T_c, n: int | None = None) -> np.ndarray:
+    """Temperatures inicials (tots els punts a la temperatura del cos)
+
+    Returns
+    -------
+    np.ndarray
+        Vector (N,) si `T_c` és escalar, o matriu (escenaris x N)
+    """
+    if n is None:
+        n = constants.N
+    T_c = np.asarray(T_c, dtype=np.float64)
+    forma = (n,) if T_c.ndim == 0 else (len(T_c), n)
+    T = np.empty(forma, dtype=np.float64)
+    T[...] = T_c
+    return T
+
+
+def interior_pla(valor, forma: tuple) -> float | np.ndarray:
+    """Valor per escenari estès a `forma` i aplanat com `T.reshape(-1)[1:-1]`
+
+    Serveix per operar amb les temperatures aplanades (vistes 1D contigües).
+    Si `valor` és escalar es retorna tal qual.
+    """
+    if np.ndim(valor) == 0:
+        return float(valor)
+    return np.ascontiguousarray(np.broadcast_to(valor, forma).reshape(-1)[1:-1])
+
+
+def nodes_interiors_pla(valor, forma: tuple) -> float | np.ndarray:
+    """Com `interior_pla`, per un valor de cada node interior (mida N - 2 a l'últim eix)
+
+    Les posicions dels extrems de cada escenari (que queden dins del vector aplanat
+    quan n'hi ha diversos) valen 0. Si `valor` és escalar es retorna tal qual.
+    """
+    if np.ndim(valor) == 0:
+        return float(valor)
+    complet = np.zeros(forma, dtype=np.float64)
+    complet[..., 1:-1] = valor
+    return np.ascontiguousarray(complet.reshape(-1)[1:-1])
@@ -0,0 +1,184 @@
+"""
+Escombrat de paràmetres en paral·lel
+
+Executa una graella de configuracions (mètode, q, N i canvis de constants)
+repartint-les entre processos, un per nucli de la màquina per defecte.
+Cada procés té la seva pròpia còpia de `constants`, així que els canvis
+d'una configuració no afecten les altres.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.bdf2 import bdf2
+from heartless.captures import Captures, nombre_iteracions
+from heartless.configuracio import constants, constants_modificades
+from heartless.crank import crank_nicolson
+from heartless.espectral import exacte_espectral
+from heartless.explicit import euler_explicit
+from heartless.exponencial import exponencial
+from heartless.implicit import euler_implicit
+from heartless.malla import dx_configurat, pas_minim
+from heartless.normalitzacio import desnormalitza_temperatura
+from heartless.tr_bdf2 import tr_bdf2
+
+METODES = {
+    "explicit": euler_explicit,
+    "implicit": euler_implicit,
+    "crank": crank_nicolson,
+    "bdf2": bdf2,
+    "tr_bdf2": tr_bdf2,
+    "exponencial": exponencial,
+    "espectral": exacte_espectral,
+}
+
+
+@dataclass(frozen=True)
+class Configuracio:
+    """Una execució de l'escombrat
+
+    Attributes
+    ----------
+    metode : str
+        Una de les claus de `METODES` ("explicit", "implicit", "crank", "bdf2"...)
+    q : float
+        Relació `dt = q * dx^2`
+    N : int, optional
+        Nombre de punts (per defecte constants.N)
+    canvis : tuple[tuple[str, Any], ...]
+        Constants que es modifiquen, com a parelles (nom, valor)
+    """
+
+    metode: str
+    q: float
+    N: int | None = None
+    canvis: tuple = ()
+
+
+@dataclass(frozen=True)
+class ResultatEscombrat:
+    """Resultat d'una configuració
+
+    Attributes
+    ----------
+    configuracio : Configuracio
+    temperatures : np.ndarray
+        Captures de temperatura en ºC (per defecte només l'estat final)
+    iteracions : int
+        Nombre d'iteracions temporals calculades
+    segons : float
+        Temps de càlcul en segons
+    """
+
+    configuracio: Configuracio
+    temperatures: np.ndarray
+    iteracions: int
+    segons: float
+
+    @property
+    def temperatura_maxima(self) -> float:
+        return float(self.temperatures[-1].max())
+
+
+def graella(metodes, qs, Ns=(None,), canvis=({},)) -> list[Configuracio]:
+    """Totes les combinacions de mètodes, q, N i canvis de constants
+
+    Parameters
+    ----------
+    metodes : Iterable[str]
+    qs : Iterable[float]
+    Ns : Iterable[int | None]
+    canvis : Iterable[dict]
+        Diccionaris de constants a modificar (per exemple `{"VOLTATGE": 30.0}`)
+
+    Returns
+    -------
+    list[Configuracio]
+    """
+    return [
+        Configuracio(metode, q, N, tuple(sorted(canvi.items())))
+        for metode, q, N, canvi in itertools.product(metodes, qs, Ns, canvis)
+    ]
+
+
+def executa_configuracio(
+    configuracio: Configuracio, captures: Captures | None = None
+) -> ResultatEscombrat:
+    """Executa una sola configuració (és el que fa cada procés)"""
+    if captures is None:
+        captures = Captures(nomes_final=True)
+    canvis = dict(configuracio.canvis)
+    if configuracio.N is not None:
+        canvis["N"] = configuracio.N
+
+    with constants_modificades(**canvis):
+        dx = dx_configurat()
+        # En una malla no uniforme, dt el limita la distància més petita entre nodes
+        dt = configuracio.q * pas_minim(dx) ** 2
+        metode = METODES[configuracio.metode]
+
+        inici = time.perf_counter()
+        T = metode(dx, dt, captures=captures)
+        segons = time.perf_counter() - inici
+
+        iteracions = nombre_iteracions(dt)
+        return ResultatEscombrat(
+            configuracio, desnormalitza_temperatura(T), iteracions, segons
+        )
+
+
+def executa_escombrat(
+    configuracions, processos: int | None = None, captures: Captures | None = None
+) -> list[ResultatEscombrat]:
+    """Executa totes les configuracions en paral·lel
+
+    Parameters
+    ----------
+    configuracions : Iterable[Configuracio]
+        Per exemple el resultat de `graella`
+    processos : int, optional
+        Nombre de processos (per defecte un per nucli)
+    captures : Captures, optional
+        Què es guarda de cada execució (per defecte només l'estat final)
+
+    Returns
+    -------
+    list[ResultatEscombrat]
+        Un resultat per configuració, en el mateix ordre
+    """
+    configuracions = list(configuracions)
+    if processos is None:
+        processos = os.cpu_count() or 1
+    processos = max(1, min(processos, len(configuracions)))
+
+    if processos == 1:
+        return [executa_configuracio(c, captures) for c in configuracions]
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        return list(
+            pool.map(
+                executa_configuracio,
+                configuracions,
+                itertools.repeat(captures),
+            )
+        )
+
+
+def taula_resultats(resultats) -> str:
+    """Taula de text amb una fila per configuració (mètode, q, N, canvis, iteracions, temps, T màxima)"""
+    capcalera = f"{'Mètode':<10}{'q':>8}{'N':>7}  {'Canvis':<28}{'Iter.':>9}{'Temps [s]':>12}{'T max [ºC]':>12}"
+    files = [capcalera, "-" * len(capcalera)]
+    for r in resultats:
+        c = r.configuracio
+        N = c.N if c.N is not None else constants.N
+        canvis = ", ".join(f"{nom}={valor}" for nom, valor in c.canvis) or "-"
+        files.append(
+            f"{c.metode:<10}{c.q:>8g}{N:>7}  {canvis:<28}{r.iteracions:>9}"
+            f"{r.segons:>12.4f}{r.temperatura_maxima:>12.3f}"
+        )
+    return "\n".join(files)
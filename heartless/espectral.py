@@ -0,0 +1,149 @@
+"""
+Propagador espectral exacte del sistema semidiscret
+
+Els mètodes en diferències finites discretitzen l'espai amb la matriu tridiagonal
+`L / dx^2` (L té -2 a la diagonal i 1 a les altres dues), i després avancen en el temps.
+Si no discretitzem el temps, el sistema `dv/dt = L v / dx^2 + font` (amb `v = T - T_c`,
+que val 0 als extrems) es resol exactament: L es diagonalitza amb la transformada
+sinus discreta (DST-I), amb valors propis `-4 sin^2(k pi / (2 (n + 1))) / dx^2`.
+
+Partint de `v = 0`, cada mode evoluciona com `font_k (exp(lambda_k t) - 1) / lambda_k`,
+així que el perfil a qualsevol temps costa una DST, O(N log N), sense cap dt.
+És la referència exacta per la discretització espacial dels mètodes: la diferència
+amb un mètode és només el seu error temporal.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from heartless.captures import Captures, temps_captures
+from heartless.configuracio import constants
+from heartless.escenaris import prepara_escenaris
+from heartless.normalitzacio import desnormalitza_distancia, desnormalitza_temperatura
+from heartless.teixit import es_homogeni, operador_constant
+
+
+def dst1(x: np.ndarray) -> np.ndarray:
+    """Transformada sinus discreta de tipus I a l'últim eix, amb la FFT
+
+    `y_k = sum_j x_j sin(pi j k / (n + 1))`, per j, k = 1..n.
+    Aplicar-la dos cops multiplica per `(n + 1) / 2`.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    # Extensió senar de mida 2(n+1): [0, x, 0, -x invertit]
+    estes = np.zeros(x.shape[:-1] + (2 * (n + 1),), dtype=np.float64)
+    estes[..., 1 : n + 1] = x
+    estes[..., n + 2 :] = -x[..., ::-1]
+    return -np.fft.rfft(estes, axis=-1)[..., 1 : n + 1].imag / 2
+
+
+@lru_cache(maxsize=8)
+def base_espectral(n: int, dx: float) -> tuple[np.ndarray, np.ndarray]:
+    """Valors propis de `L / dx^2` i coeficients de la font unitària, per `n` nodes interiors
+
+    Es calcula un sol cop per malla (N, dx).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Valors propis (negatius) i la DST del vector de uns
+    """
+    k = np.arange(1, n + 1, dtype=np.float64)
+    valors_propis = -4 * np.sin(k * np.pi / (2 * (n + 1))) ** 2 / (dx * dx)
+    coef_font = dst1(np.ones(n))
+    for arr in (valors_propis, coef_font):
+        arr.flags.writeable = False
+    return valors_propis, coef_font
+
+
+def resposta_font(temps, n: int, dx: float) -> np.ndarray:
+    """Increment de temperatura (normalitzat) dels nodes interiors amb font unitària
+
+    Returns
+    -------
+    np.ndarray
+        Matriu (temps x n)
+    """
+    temps = np.atleast_1d(np.asarray(temps, dtype=np.float64))
+    valors_propis, coef_font = base_espectral(n, dx)
+    # (exp(lambda t) - 1) / lambda, sense perdre precisió per temps petits
+    coef = np.expm1(np.outer(temps, valors_propis)) / valors_propis
+    return 2 / (n + 1) * dst1(coef * coef_font)
+
+
+class PropagadorEspectral:
+    """Solució exacta del sistema semidiscret a qualsevol temps
+
+    Té la mateixa interfície que `SolucioAnalitica` (`x` i `avalua`), així que
+    es pot fer servir com a referència a `troba_temps_limit`.
+
+    Parameters
+    ----------
+    t_cos, voltatge : float | array_like, optional
+        Escenaris, com als mètodes (veure `prepara_escenaris`)
+    n : int, optional
+        Nombre total de nodes (per defecte constants.N)
+    """
+
+    def __init__(self, t_cos=None, voltatge=None, n: int | None = None):
+        if not es_homogeni():
+            raise ValueError("El propagador espectral només admet el teixit homogeni")
+        if n is None:
+            n = constants.N
+        self.n = n
+        self.dx = 1 / (n - 1)
+        self.x = np.linspace(0, 1, n, dtype=np.float64)
+        self.T_c, self.font = prepara_escenaris(t_cos, voltatge)
+
+    def perfils(self, temps) -> np.ndarray:
+        """Temperatures normalitzades a cada temps
+
+        Returns
+        -------
+        np.ndarray
+            Matriu (temps x N), o (temps x escenaris x N) amb diversos escenaris
+        """
+        increment = resposta_font(temps, self.n - 2, self.dx)
+        T_c = np.asarray(self.T_c, dtype=np.float64)
+        font = np.asarray(self.font, dtype=np.float64)
+
+        if T_c.ndim:
+            forma = (len(increment), len(T_c), self.n)
+        else:
+            forma = (len(increment), self.n)
+        T = np.empty(forma, dtype=np.float64)
+        T[...] = T_c
+        if font.ndim:
+            increment = increment[:, np.newaxis, :]
+        T[..., 1:-1] += font * increment
+        return T
+
+    def avalua(self, temps):
+        """Com `SolucioAnalitica.avalua`: posicions (m), temperatures (ºC) i cota (0, és exacta)"""
+        return (
+            desnormalitza_distancia(self.x),
+            desnormalitza_temperatura(self.perfils(temps)),
+            0.0,
+        )
+
+
+def exacte_espectral(
+    dx, dt, t_cos=None, captures: Captures | None = None, voltatge=None
+) -> np.ndarray:
+    """Solució exacta semidiscreta amb la mateixa crida que els mètodes (`euler_implicit`...)
+
+    `dt` només determina els temps de les files retornades (els de la política de captures),
+    no afecta la precisió. Només és vàlid a la malla uniforme.
+
+    Returns
+    -------
+    np.ndarray
+        Temperatures normalitzades (captures x N), o (captures x escenaris x N)
+    """
+    if not operador_constant(dx):
+        raise ValueError("El propagador espectral només admet la malla uniforme i el teixit homogeni")
+    n = round(1 / dx) + 1
+    propagador = PropagadorEspectral(t_cos, voltatge, n)
+    return propagador.perfils(temps_captures(dt, captures))
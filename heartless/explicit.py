@@ -1,51 +1,162 @@
 import numpy as np
 
+from heartless.captures import (
+    Captures,
+    nombre_iteracions,
+    recull_captures,
+    temps_captures,
+)
 from heartless.configuracio import constants, settings
-from heartless.normalitzacio import desnormalitza_temperatura, normalitza_temperatura
-from heartless.utils import guardar_matriu
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.escenaris import estat_inicial, interior_pla, nodes_interiors_pla
+from heartless.malla import dx_configurat, nombre_nodes, pas_minim
+from heartless.memoria_cau import memoria_cau
+from heartless.normalitzacio import desnormalitza_temperatura
+from heartless.protocol import FontProtocol, prepara_protocol
+from heartless.teixit import operador, operador_constant
 
 
-def euler_explicit(dx, dt,t_cos=None) -> np.ndarray:
-    if t_cos is None:
-        t_cos = constants.T_COS
-    t_cos = normalitza_temperatura(t_cos)
+def itera_euler_explicit(dx, dt, t_cos=None, voltatge=None):
+    """Generador del mètode d'Euler Explícit, iteració a iteració fins a `t_a`
 
-    def euler_step_arr(Tnow):
-        # Creem un array plena de T_COS
-        # Simplifica afegir les condicions de contorn,
-        # perquè sabem que els extrems estaran sempre a T_COS
-        Tnext = np.full(Tnow.shape, t_cos, dtype=np.float64)
+    Només utilitza dos vectors de treball (l'actual i el següent) que es van intercanviant.
+    El vector que es retorna es reutilitza en les iteracions següents:
+    s'ha de copiar si es vol guardar.
 
+    Si `t_cos` o `voltatge` són llistes, avança tots els escenaris a la vegada
+    i les temperatures són una matriu (escenaris x N) (veure `prepara_escenaris`).
+    `voltatge` també pot ser un protocol que canvia amb el temps (veure `heartless.protocol`).
+    Si `dx` és un array, són les posicions d'una malla no uniforme (veure `heartless.malla`),
+    i si el teixit malalt té propietats diferents, els coeficients són els de `heartless.teixit`.
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Iteració, temps normalitzat i temperatures normalitzades
+    """
+    if not operador_constant(dx):
+        yield from _itera_euler_explicit_variable(dx, dt, t_cos, voltatge)
+        return
+
+    t_cos, font, escala = prepara_protocol(t_cos, voltatge, dt, "explicit")
+    r = dt / (dx**2)
+
+    # Imposem les condicions inicials a T_COS
+    # Els extrems estaran sempre a T_COS, els dos vectors ja els tenen
+    Tnow = estat_inicial(t_cos)
+    Tnext = Tnow.copy()
+    yield 0, 0.0, Tnow
+
+    # Treballem sobre els vectors aplanats (vistes 1D contigües, creades un sol cop):
+    # el bucle només fa operacions in situ (`out=`) i no reserva memòria.
+    # Amb diversos escenaris també es calculen els extrems de cada fila, que després es restauren
+    N = Tnow.shape[-1]
+    a = FontProtocol(interior_pla(dt * font, Tnow.shape), escala, Tnow.shape)
+    extrems = np.ravel(t_cos)
+
+    def vistes(T):
+        pla = T.reshape(-1)
+        return pla[:-2], pla[1:-1], pla[2:], pla[0::N], pla[N - 1 :: N]
+
+    ara, seguent = vistes(Tnow), vistes(Tnext)
+    for i in range(1, nombre_iteracions(dt)):
         # Mètode d'Euler explicit amb l'equació trobada
-        # S'han agafat els intervals adequats pel resultat
-        Tnext[1:-1] = (
-            (dt / (dx**2)) * (Tnow[2:] - 2 * Tnow[1:-1] + Tnow[:-2]) + dt + Tnow[1:-1]
-        )
-        return Tnext
+        # r * (T[j+1] - 2 T[j] + T[j-1]) + dt * font + T[j], en el mateix ordre de sempre
+        esq, centre, dreta, _, _ = ara
+        _, interior, _, inici, final = seguent
+        np.multiply(centre, -2.0, out=interior)
+        np.add(interior, dreta, out=interior)
+        np.add(interior, esq, out=interior)
+        np.multiply(interior, r, out=interior)
+        np.add(interior, a(i), out=interior)
+        np.add(interior, centre, out=interior)
+        if Tnow.ndim > 1:
+            np.copyto(inici, extrems)
+            np.copyto(final, extrems)
+
+        Tnow, Tnext = Tnext, Tnow
+        ara, seguent = seguent, ara
+        yield i, i * dt, Tnow
+
 
-    # Generem la matriu amb tots els valors que necessitem
-    # Utilitzant dt i el temps que volem arribar coneixem el tamany de la matríu
-    Temperatures = np.zeros(
-        (int(constants.t_a // dt) + 1, constants.N), dtype=np.float64
+def _itera_euler_explicit_variable(dx, dt, t_cos=None, voltatge=None):
+    """`itera_euler_explicit` amb un pes diferent per cada node (malla o teixit no uniformes)
+
+    Com amb els coeficients constants, es treballa sobre els vectors aplanats
+    amb els pesos de cada node estesos a tots els escenaris.
+    """
+    t_cos, font, escala = prepara_protocol(t_cos, voltatge, dt, "explicit")
+    esq, centre, dreta, font_node = operador(dx)
+
+    Tnow = estat_inicial(t_cos, nombre_nodes(dx))
+    Tnext = Tnow.copy()
+    yield 0, 0.0, Tnow
+
+    # T[j] + dt * (esq T[j-1] + centre T[j] + dreta T[j+1] + font)
+    forma = Tnow.shape
+    pes_esq, pes_centre, pes_dreta = (
+        nodes_interiors_pla(pes, forma) for pes in (dt * esq, 1 + dt * centre, dt * dreta)
     )
+    a = FontProtocol(nodes_interiors_pla(dt * font * font_node, forma), escala, forma)
+    N = forma[-1]
+    extrems = np.ravel(t_cos)
+    aux = np.empty(Tnow.size - 2, dtype=np.float64)
 
-    # Imposem les condicions inicials a T_COS
-    Temperatures[0, :] = t_cos
-    # Iterem per la resta de files per calcular la següent iteració temporal
-    for i in range(1, len(Temperatures)):
-        Temperatures[i] = euler_step_arr(Temperatures[i - 1])
+    def vistes(T):
+        pla = T.reshape(-1)
+        return pla[:-2], pla[1:-1], pla[2:], pla[0::N], pla[N - 1 :: N]
+
+    ara, seguent = vistes(Tnow), vistes(Tnext)
+    for i in range(1, nombre_iteracions(dt)):
+        esq, centre, dreta, _, _ = ara
+        _, interior, _, inici, final = seguent
+        np.multiply(esq, pes_esq, out=interior)
+        np.multiply(centre, pes_centre, out=aux)
+        np.add(interior, aux, out=interior)
+        np.multiply(dreta, pes_dreta, out=aux)
+        np.add(interior, aux, out=interior)
+        np.add(interior, a(i), out=interior)
+        if Tnow.ndim > 1:
+            np.copyto(inici, extrems)
+            np.copyto(final, extrems)
+
+        Tnow, Tnext = Tnext, Tnow
+        ara, seguent = seguent, ara
+        yield i, i * dt, Tnow
+
+
+def euler_explicit(
+    dx, dt, t_cos=None, captures: Captures | None = None, voltatge=None
+) -> np.ndarray:
+    # Iterem per calcular la següent iteració temporal,
+    # guardant només les files que demana la política de captures
+    Temperatures = recull_captures(
+        itera_euler_explicit(dx, dt, t_cos, voltatge), dt, captures
+    )
 
-    # Retornem tots els valors per poder graficar els resultats
+    # Retornem els valors guardats per poder graficar els resultats
     return Temperatures
 
 
-def executa_sequencia_explicit():
+def executa_sequencia_explicit(context=None):
     print("Executant Euler Explicit...")
     for q in constants.T_explicit:
-        dx = 1 / (constants.N - 1)
-        dt = q * dx * dx
-        result = euler_explicit(dx, dt)
-        guardar_matriu(
-            desnormalitza_temperatura(result), f"{settings.fitxer_explicit}_{q}"
+        dx = dx_configurat()
+        # En una malla no uniforme, dt el limita la distància més petita entre nodes
+        h = pas_minim(dx)
+        dt = q * h * h
+        # Si ja s'havia calculat amb les mateixes constants, el llegim de la memòria cau
+        captures = Captures(cada=settings.captures_cada)
+        result = memoria_cau.resultat_metode(
+            "explicit", euler_explicit, dx, dt, captures=captures
         )
+        fitxer = f"{settings.fitxer_explicit}_{q}"
+        metadades = metadades_resultat("explicit", dt, q, temps_captures(dt, captures))
+        if context is not None:
+            # Es queda en memòria per les gràfiques, el context el guardarà al final
+            context.afegeix(fitxer, desnormalitza_temperatura(result), metadades)
+        else:
+            guardar_resultat(
+                desnormalitza_temperatura(result), len(result), fitxer, metadades
+            )
     print("Euler Explicit finalitzat")
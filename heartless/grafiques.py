@@ -5,6 +5,7 @@ from matplotlib.animation import FuncAnimation
 
 from heartless.configuracio import constants, settings
 from heartless.normalitzacio import desnormalitza_temps
+from heartless.utils import files_per_fraccions
 
 
 def plot_llista_temps(x, T: np.ndarray, metode: str, ax):
@@ -14,9 +15,8 @@ def plot_llista_temps(x, T: np.ndarray, metode: str, ax):
     coef_temps = desnormalitza_temps(constants.t_a) / dim_y
 
     # Generem una llista amb els index de temps que volem plotejar segons la constant `settings.temps_plot`
-    temps_mostrar = [
-        max(0, min(int(dim_y * q), dim_y - 1)) for q in settings.temps_plot
-    ]
+    # (només s'han de llegir aquestes files, encara que T sigui un fitxer obert)
+    temps_mostrar = files_per_fraccions(dim_y, settings.temps_plot)
 
     # Per cada index calculat, corresponent a la temperatura en un temps determinat,
     # calculem el temps real (pel label) i representem la seva x i T[i]
@@ -1,26 +1,51 @@
 import numpy as np
 
+from heartless.captures import (
+    Captures,
+    nombre_iteracions,
+    recull_captures,
+    temps_captures,
+)
 from heartless.configuracio import constants, settings
-from heartless.normalitzacio import desnormalitza_temperatura, normalitza_temperatura
-from heartless.utils import gauss_pivotatge, guardar_matriu
-
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.escenaris import estat_inicial, interior_pla, nodes_interiors_pla
+from heartless.malla import dx_configurat, nombre_nodes, pas_minim
+from heartless.memoria_cau import memoria_cau
+from heartless.normalitzacio import desnormalitza_temperatura
+from heartless.protocol import FontProtocol, prepara_protocol
+from heartless.teixit import font_nodes, operador_constant, pesos_contorn
+from heartless.tridiagonal import factoritzacio_esquema
+
+
+def itera_euler_implicit(dx, dt, T_c=None, voltatge=None):
+    """Generador del mètode d'Euler Implícit, iteració a iteració fins a `t_a`
+
+    Només utilitza dos vectors de treball (l'actual i el següent) que es van intercanviant.
+    El vector que es retorna es reutilitza en les iteracions següents:
+    s'ha de copiar si es vol guardar.
+
+    Si `T_c` o `voltatge` són llistes, avança tots els escenaris a la vegada
+    i les temperatures són una matriu (escenaris x N) (veure `prepara_escenaris`).
+    `voltatge` també pot ser un protocol que canvia amb el temps (veure `heartless.protocol`).
+    Si `dx` és un array, són les posicions d'una malla no uniforme (veure `heartless.malla`),
+    i si el teixit malalt té propietats diferents, els coeficients són els de `heartless.teixit`.
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Iteració, temps normalitzat i temperatures normalitzades
+    """
+    if not operador_constant(dx):
+        yield from _itera_euler_implicit_variable(dx, dt, T_c, voltatge)
+        return
 
-def euler_implicit(dx, dt,T_c=None) -> np.ndarray:
     # definim els paràmetres
     x = constants.N
-    t = int(constants.t_a // dt + 1)
-    if T_c is None:
-        T_c = constants.T_COS
-    T_c = normalitza_temperatura(T_c)
+    T_c, font, escala = prepara_protocol(T_c, voltatge, dt, "implicit")
 
-    a = dt
+    a = dt * font
     b = dt / (dx**2)
 
-    # Mariu de temperatures
-    T = np.zeros((t, x))
-
-    T[0, :] = T_c  # generem la condició inicial (tots punts a temperatura cos)
-
     """Apunt important:
     Tant la matriu A com el vector c es defineixen amb n_files = len(T) - 2
     Aixo succeeix perque els extrems de T estan connectats a una font i
@@ -29,68 +54,126 @@ def euler_implicit(dx, dt,T_c=None) -> np.ndarray:
     T_0 = T_{n-1} = T_COS
     """
 
-    # Definim el vector c, de l'equacio Ax = c
-    def vec_c(T_actual, a, b, T_cc_esq, T_cc_dret):
-        x = len(T_actual)
-        c = np.zeros(x - 2)
-
-        for j in range(1, x - 1):
-            c_i = j - 1
-
-            # Equació trobada d'Euler implicit
-            c[c_i] = T_actual[j] + a
-
-            # Els extrems tenen una forma diferent
-            if j == 1:
-                c[c_i] += b * T_cc_esq
-            elif j == x - 2:
-                c[c_i] += b * T_cc_dret
-
-        return c
+    # La matriu tridiagonal és constant en totes les iteracions,
+    # la factoritzem un sol cop (i queda guardada per (N, dx, dt))
+    A = factoritzacio_esquema("implicit", x, dx, dt)
+
+    # generem la condició inicial (tots punts a temperatura cos)
+    # Els extrems estan connectats a la font, els dos vectors ja els tenen
+    T_actual = estat_inicial(T_c, x)
+    T_seguent = T_actual.copy()
+    yield 0, 0.0, T_actual
+
+    # Vector c de l'equacio Ax = c, reservat un sol cop amb la mida de T:
+    # es calcula sobre les vistes aplanades (1D contigües) i `c` és la part interior.
+    # Totes les vistes es creen abans del bucle, que només fa operacions in situ (`out=`)
+    # i no reserva memòria (amb diversos escenaris, el sistema es resol a `treball`)
+    W = np.empty_like(T_actual)
+    c_pla, c_sistema = W.reshape(-1)[1:-1], W[..., 1:-1].T
+    a = FontProtocol(interior_pla(a, T_actual.shape), escala, T_actual.shape)
+    contorn = _contorn(W, b, b, T_c)
+    treball = None if T_actual.ndim == 1 else np.empty(c_sistema.shape)
+
+    def vistes(T):
+        return T.reshape(-1)[1:-1], T[..., 1:-1].T
+
+    actual, seguent = vistes(T_actual), vistes(T_seguent)
+    for i in range(1, nombre_iteracions(dt)):
+        # Equació trobada d'Euler implicit, els extrems tenen una forma diferent
+        np.add(actual[0], a(i), out=c_pla)
+        for vora, terme in contorn:
+            np.add(vora, terme, out=vora)
+
+        # trobem les x solucions del sistema en O(N)
+        # (el sistema va per l'eix 0, per això transposem si hi ha escenaris)
+        A.resol(c_sistema, out=seguent[1], treball=treball)
+        T_actual, T_seguent = T_seguent, T_actual
+        actual, seguent = seguent, actual
+        yield i, i * dt, T_actual
+
+
+def _itera_euler_implicit_variable(dx, dt, T_c=None, voltatge=None):
+    """`itera_euler_implicit` amb un pes diferent per cada node (malla o teixit no uniformes)
+
+    La matriu és `I - dt L`, amb els coeficients de l'operador de cada node,
+    i els extrems hi contribueixen amb el pes del veí que tenen a la font.
+    El terme independent es calcula sobre els vectors aplanats, com amb els coeficients constants.
+    """
+    T_c, font, escala = prepara_protocol(T_c, voltatge, dt, "implicit")
+    n = nombre_nodes(dx)
+    b_esq, b_dret = pesos_contorn(dx, dt)
 
-    # Definim la matriu, de l'equacio Ax = c
-    # segons l'equació d'Euler Implícit
-    def matriu_A(b, x):
-        n_interior = x - 2
+    A = factoritzacio_esquema("implicit", n, dx, dt)
 
-        A = np.zeros((n_interior, n_interior))
+    T_actual = estat_inicial(T_c, n)
+    T_seguent = T_actual.copy()
+    yield 0, 0.0, T_actual
 
-        for i in range(n_interior):
-            A[i, i] = 1 + 2 * b  # diagonal principal
+    forma = T_actual.shape
+    W = np.empty_like(T_actual)
+    c_pla, c_sistema = W.reshape(-1)[1:-1], W[..., 1:-1].T
+    a = FontProtocol(nodes_interiors_pla(dt * font * font_nodes(dx), forma), escala, forma)
+    contorn = _contorn(W, b_esq, b_dret, T_c)
+    treball = None if T_actual.ndim == 1 else np.empty(c_sistema.shape)
 
-            if i > 0:
-                A[i, i - 1] = -b  # diagonal inferior
+    def vistes(T):
+        return T.reshape(-1)[1:-1], T[..., 1:-1].T
 
-            if i < n_interior - 1:  # diagonal superior
-                A[i, i + 1] = -b
+    actual, seguent = vistes(T_actual), vistes(T_seguent)
+    for i in range(1, nombre_iteracions(dt)):
+        np.add(actual[0], a(i), out=c_pla)
+        for vora, terme in contorn:
+            np.add(vora, terme, out=vora)
 
-        return A
+        # El sistema va per l'eix 0, per això transposem si hi ha escenaris
+        A.resol(c_sistema, out=seguent[1], treball=treball)
+        T_actual, T_seguent = T_seguent, T_actual
+        actual, seguent = seguent, actual
+        yield i, i * dt, T_actual
 
-    A = matriu_A(b, x)  # La matriu és una constant en totes les iteracions
 
-    for i in range(t - 1):
-        c = vec_c(
-            T[i, :], a, b, T_c, T_c
-        )  # calcular vector c segons les condicions anteriors
+def _contorn(W: np.ndarray, b_esq: float, b_dret: float, T_c) -> list:
+    """Vistes del primer i l'últim node interior de `W` i el terme de contorn de cadascun
 
-        T_interior = gauss_pivotatge(A, c)  # trobem les x solucions del sistema
+    Amb diversos escenaris són dues vistes del vector aplanat (una per cada extrem).
+    Amb un sol vector, els dos nodes van en una sola vista de dos elements:
+    NumPy reserva memòria a cada operació amb vectors d'un sol element.
+    """
+    n = W.shape[-1]
+    pla = W.reshape(-1)
+    T_c = np.ravel(T_c)
+    if W.ndim == 1 and n > 3:
+        return [(pla[1 : n - 1 : n - 3], np.concatenate([b_esq * T_c, b_dret * T_c]))]
+    return [(pla[1::n], b_esq * T_c), (pla[n - 2 :: n], b_dret * T_c)]
 
-        # definim les temperatures de la matriu T aplicant les condicions de contorn
-        T[i + 1, 0] = T_c
-        T[i + 1, -1] = T_c
-        T[i + 1, 1:-1] = T_interior
 
-    return T
+def euler_implicit(
+    dx, dt, T_c=None, captures: Captures | None = None, voltatge=None
+) -> np.ndarray:
+    # Matriu de temperatures, només amb les files de la política de captures
+    return recull_captures(itera_euler_implicit(dx, dt, T_c, voltatge), dt, captures)
 
 
-def executa_sequencia_implicit():
+def executa_sequencia_implicit(context=None):
     # Per cada valor de T_implicit, calculem i guardem el mètode d'Euler Implícit
     print("Executant Euler Implícit")
     for q in constants.T_implicit:
-        dx = 1 / (constants.N - 1)
-        dt = q * dx * dx
-        result = euler_implicit(dx, dt)
-        guardar_matriu(
-            desnormalitza_temperatura(result), f"{settings.fitxer_implicit}_{q}"
+        dx = dx_configurat()
+        # En una malla no uniforme, dt el limita la distància més petita entre nodes
+        h = pas_minim(dx)
+        dt = q * h * h
+        # Si ja s'havia calculat amb les mateixes constants, el llegim de la memòria cau
+        captures = Captures(cada=settings.captures_cada)
+        result = memoria_cau.resultat_metode(
+            "implicit", euler_implicit, dx, dt, captures=captures
         )
+        fitxer = f"{settings.fitxer_implicit}_{q}"
+        metadades = metadades_resultat("implicit", dt, q, temps_captures(dt, captures))
+        if context is not None:
+            # Es queda en memòria per les gràfiques, el context el guardarà al final
+            context.afegeix(fitxer, desnormalitza_temperatura(result), metadades)
+        else:
+            guardar_resultat(
+                desnormalitza_temperatura(result), len(result), fitxer, metadades
+            )
     print("Euler Implícit finalitzat")
@@ -0,0 +1,178 @@
+"""
+Malles no uniformes (graduades) de l'interval normalitzat [0, 1]
+
+Els gradients més forts són a prop dels elèctrodes (x = 0 i x = 1) i de la frontera
+entre teixit sa i malalt. Amb una malla uniforme cal augmentar N a tot arreu per
+resoldre'ls; amb una malla graduada s'agrupen els punts només on cal.
+
+Els mètodes reben la malla pel mateix paràmetre `dx`: un float és la malla uniforme
+de sempre (amb `1 / dx + 1` punts) i un array són les posicions normalitzades dels nodes.
+La segona derivada en una malla no uniforme, amb `h_e = x[j] - x[j-1]` i `h_d = x[j+1] - x[j]`, és
+
+    T''(x[j]) ~ 2 T[j-1] / (h_e (h_e + h_d)) - 2 T[j] / (h_e h_d) + 2 T[j+1] / (h_d (h_e + h_d))
+
+que amb `h_e = h_d = dx` és la de sempre, `(T[j-1] - 2 T[j] + T[j+1]) / dx^2`.
+"""
+
+import numpy as np
+
+from heartless.configuracio import constants, settings
+from heartless.normalitzacio import normalitza_distancia
+
+# Punts de la malla fina on s'integra la densitat per cada node de `malla_graduada`
+PUNTS_INTEGRACIO = 64
+
+
+def es_uniforme(dx) -> bool:
+    """Si `dx` és un increment (malla uniforme) i no les posicions d'una malla"""
+    return np.ndim(dx) == 0
+
+
+def malla_uniforme(n: int | None = None) -> np.ndarray:
+    """Posicions normalitzades de la malla uniforme de `n` punts (per defecte constants.N)"""
+    if n is None:
+        n = constants.N
+    return np.linspace(0, 1, n, dtype=np.float64)
+
+
+def fronteres_teixit() -> tuple[float, float]:
+    """Posicions normalitzades de la frontera entre teixit sa i malalt"""
+    meitat = normalitza_distancia(constants.l_mal) / 2
+    return 0.5 - meitat, 0.5 + meitat
+
+
+def malla_graduada(
+    n: int | None = None,
+    centres=None,
+    amplada: float | None = None,
+    intensitat: float | None = None,
+) -> np.ndarray:
+    """Malla de `n` punts agrupats al voltant dels `centres`
+
+    Els nodes equidistribueixen la densitat `1 + intensitat * sum_c exp(-((x - c) / amplada)^2)`:
+    entre dos nodes consecutius sempre hi ha la mateixa integral de la densitat.
+    Prop d'un centre, els punts estan fins a `1 + intensitat` vegades més junts.
+
+    Parameters
+    ----------
+    n : int, optional
+        Nombre de punts, incloent els extrems (per defecte constants.N)
+    centres : Iterable[float], optional
+        Posicions normalitzades on s'agrupen els punts
+        (per defecte els elèctrodes i les fronteres del teixit malalt)
+    amplada : float, optional
+        Amplada normalitzada de cada agrupament (per defecte `settings.malla_amplada`)
+    intensitat : float, optional
+        Quantes vegades més densa és la malla als centres (per defecte `settings.malla_intensitat`)
+
+    Returns
+    -------
+    np.ndarray
+        Posicions normalitzades, creixents, amb `x[0] = 0` i `x[-1] = 1`
+    """
+    if n is None:
+        n = constants.N
+    if centres is None:
+        centres = (0.0, *fronteres_teixit(), 1.0)
+    if amplada is None:
+        amplada = settings.malla_amplada
+    if intensitat is None:
+        intensitat = settings.malla_intensitat
+
+    s = np.linspace(0, 1, PUNTS_INTEGRACIO * n, dtype=np.float64)
+    centres = np.asarray(centres, dtype=np.float64)
+    densitat = 1 + intensitat * np.exp(
+        -(((s[:, np.newaxis] - centres) / amplada) ** 2)
+    ).sum(axis=1)
+
+    # Integral acumulada (regla del trapezi) i la invertim per interpolació
+    acumulada = np.empty_like(s)
+    acumulada[0] = 0.0
+    np.cumsum((densitat[1:] + densitat[:-1]) / 2 * np.diff(s), out=acumulada[1:])
+    acumulada /= acumulada[-1]
+
+    x = np.interp(np.linspace(0, 1, n), acumulada, s)
+    x[0], x[-1] = 0.0, 1.0
+    return x
+
+
+def valida_malla(x) -> np.ndarray:
+    """Comprova que `x` és una malla vàlida de [0, 1] i la retorna com a array"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim != 1 or len(x) < 3:
+        raise ValueError("La malla ha de ser un vector d'almenys 3 posicions")
+    if x[0] != 0.0 or x[-1] != 1.0:
+        raise ValueError("La malla (normalitzada) ha d'anar de 0 a 1")
+    if np.any(np.diff(x) <= 0):
+        raise ValueError("Les posicions de la malla han de ser estrictament creixents")
+    return x
+
+
+def malla_configurada() -> np.ndarray:
+    """Posicions normalitzades de la malla de `settings.malla`
+
+    - "uniforme": `constants.N` punts equiespaiats (el comportament original)
+    - "graduada": `malla_graduada()`, agrupada als elèctrodes i a les fronteres del teixit
+    - una llista de posicions en metres, de 0 a `constants.L` (amb `constants.N` punts)
+    """
+    if isinstance(settings.malla, str):
+        if settings.malla == "uniforme":
+            return malla_uniforme()
+        if settings.malla == "graduada":
+            return malla_graduada()
+        raise ValueError(f"Malla desconeguda: '{settings.malla}'")
+
+    x = valida_malla(normalitza_distancia(np.asarray(settings.malla, dtype=np.float64)))
+    if len(x) != constants.N:
+        raise ValueError(
+            f"La malla té {len(x)} punts però constants.N és {constants.N}"
+        )
+    return x
+
+
+def dx_configurat() -> float | np.ndarray:
+    """Argument `dx` dels mètodes per la malla de `settings.malla`
+
+    És un float (l'increment) per la malla uniforme, així que els mètodes
+    fan exactament els mateixos càlculs que abans; si no, les posicions dels nodes.
+    """
+    if settings.malla == "uniforme":
+        return 1 / (constants.N - 1)
+    return malla_configurada()
+
+
+def nodes(dx) -> np.ndarray:
+    """Posicions normalitzades dels nodes d'un argument `dx` dels mètodes"""
+    if es_uniforme(dx):
+        return malla_uniforme(round(1 / dx) + 1)
+    return np.asarray(dx, dtype=np.float64)
+
+
+def pas_minim(dx) -> float:
+    """Distància més petita entre dos nodes (la que limita dt en els mètodes explícits)"""
+    if es_uniforme(dx):
+        return dx
+    return float(np.diff(dx).min())
+
+
+def coeficients_laplacia(x) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Coeficients de la segona derivada a cada node interior de la malla
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        Pes del veí esquerre, del node i del veí dret, de mida `len(x) - 2`
+    """
+    h = np.diff(np.asarray(x, dtype=np.float64))
+    h_esq, h_dret = h[:-1], h[1:]
+    esq = 2 / (h_esq * (h_esq + h_dret))
+    dreta = 2 / (h_dret * (h_esq + h_dret))
+    return esq, -(esq + dreta), dreta
+
+
+def nombre_nodes(dx) -> int:
+    """Nombre de nodes d'un argument `dx` dels mètodes (constants.N per la malla uniforme)"""
+    if es_uniforme(dx):
+        return constants.N
+    return len(dx)
+
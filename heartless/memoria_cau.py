@@ -0,0 +1,166 @@
+"""
+Memòria cau persistent dels resultats dels mètodes
+
+Cada resultat es guarda a `settings.cache_path` com un `.npy` amb el nom igual al hash
+(SHA-256) de tot el que el determina: les `constants`, el mètode i els seus paràmetres
+(dx, dt, t_cos, captures...), i també el codi dels mètodes: el hash de tots els fitxers
+`heartless/*.py`. Si no ha canviat res, el resultat es llegeix del disc en lloc de tornar-lo
+a calcular; si canvia qualsevol constant o qualsevol fitxer del paquet, el hash és diferent
+i els resultats antics ja no es fan servir (s'acaben esborrant per LRU).
+
+La mida total està limitada per `settings.cache_mida_mb`: quan se supera, s'esborren
+els resultats utilitzats fa més temps (LRU, segons la data de modificació del fitxer,
+que s'actualitza a cada lectura).
+"""
+
+import glob
+import hashlib
+import json
+import os
+from dataclasses import asdict, is_dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from heartless.configuracio import constants, settings
+
+
+@lru_cache(maxsize=1)
+def versio_codi() -> str:
+    """Hash del codi font del paquet (tots els `heartless/*.py`)"""
+    resum = hashlib.sha256()
+    for fitxer in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        resum.update(os.path.basename(fitxer).encode())
+        with open(fitxer, "rb") as f:
+            resum.update(f.read())
+    return resum.hexdigest()
+
+
+def _serialitzable(valor):
+    if is_dataclass(valor):
+        return asdict(valor)
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class MemoriaCau:
+    """Memòria cau en disc amb claus per contingut i esborrat LRU
+
+    Parameters
+    ----------
+    directori : str, optional
+        Carpeta on es guarden els resultats (per defecte `settings.cache_path`)
+    mida_maxima : int, optional
+        Mida màxima en bytes (per defecte `settings.cache_mida_mb`)
+    activa : bool, optional
+        Si és False, sempre es calcula (per defecte `settings.usa_cache`)
+    """
+
+    def __init__(
+        self,
+        directori: str | None = None,
+        mida_maxima: int | None = None,
+        activa: bool | None = None,
+    ):
+        self.directori = directori or os.path.join(os.getcwd(), settings.cache_path)
+        if mida_maxima is None:
+            mida_maxima = int(settings.cache_mida_mb * 1024 * 1024)
+        self.mida_maxima = mida_maxima
+        self.activa = settings.usa_cache if activa is None else activa
+        self.encerts = 0
+        self.errades = 0
+
+    def clau(self, metode: str, **parametres) -> str:
+        """Hash de les constants, el codi, el mètode i els paràmetres"""
+        contingut = {
+            "constants": asdict(constants),
+            "codi": versio_codi(),
+            "metode": metode,
+            "parametres": {nom: _serialitzable(v) for nom, v in parametres.items()},
+        }
+        text = json.dumps(contingut, sort_keys=True, default=repr)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _fitxer(self, clau: str) -> str:
+        return os.path.join(self.directori, clau + ".npy")
+
+    def obte(self, clau: str) -> np.ndarray | None:
+        """Resultat guardat amb aquesta clau, o None si no hi és"""
+        fitxer = self._fitxer(clau)
+        if not os.path.exists(fitxer):
+            self.errades += 1
+            return None
+        try:
+            valor = np.load(fitxer)
+        except (OSError, ValueError) as e:
+            print(f"Error llegint la memòria cau: {e}")
+            self.errades += 1
+            return None
+        # Marquem el fitxer com a utilitzat ara (per l'esborrat LRU)
+        os.utime(fitxer)
+        self.encerts += 1
+        return valor
+
+    def guarda(self, clau: str, valor: np.ndarray) -> None:
+        """Guarda un resultat i esborra els més antics si se supera la mida màxima"""
+        try:
+            os.makedirs(self.directori, exist_ok=True)
+            np.save(self._fitxer(clau), np.asarray(valor))
+        except (OSError, ValueError) as e:
+            print(f"Error guardant a la memòria cau: {e}")
+            return
+        self.neteja()
+
+    def neteja(self) -> None:
+        """Esborra els resultats utilitzats fa més temps fins que la mida total és la permesa"""
+        if not os.path.isdir(self.directori):
+            return
+        fitxers = []
+        for nom in os.listdir(self.directori):
+            if nom.endswith(".npy"):
+                info = os.stat(os.path.join(self.directori, nom))
+                fitxers.append((info.st_mtime, info.st_size, nom))
+
+        total = sum(mida for _, mida, _ in fitxers)
+        for _, mida, nom in sorted(fitxers):
+            if total <= self.mida_maxima:
+                break
+            os.remove(os.path.join(self.directori, nom))
+            total -= mida
+
+    def calcula(self, metode: str, funcio, **parametres) -> np.ndarray:
+        """Retorna `funcio(**parametres)`, des de la memòria cau si ja s'havia calculat"""
+        if not self.activa:
+            return funcio(**parametres)
+
+        clau = self.clau(metode, **parametres)
+        valor = self.obte(clau)
+        if valor is None:
+            valor = funcio(**parametres)
+            self.guarda(clau, valor)
+        return valor
+
+    def resultat_metode(self, metode: str, funcio, dx, dt, t_cos=None, captures=None):
+        """Resultat d'un mètode (`euler_explicit`, `euler_implicit`, `crank_nicolson`)"""
+        return self.calcula(
+            metode,
+            lambda dx, dt, t_cos, captures: funcio(dx, dt, t_cos, captures),
+            dx=dx,
+            dt=dt,
+            t_cos=t_cos,
+            captures=captures,
+        )
+
+    def informe(self) -> str:
+        total = self.encerts + self.errades
+        percentatge = 100 * self.encerts / total if total else 0.0
+        return (
+            f"Memòria cau: {self.encerts} encerts, {self.errades} errades "
+            f"({percentatge:.0f}% d'encerts)"
+        )
+
+
+memoria_cau = MemoriaCau()
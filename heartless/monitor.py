@@ -0,0 +1,125 @@
+"""
+Vigilància en línia dels límits de temperatura del tractament
+
+A mesura que un mètode genera iteracions (`itera_euler_explicit`, `itera_euler_implicit`,
+`itera_crank_nicolson`) comprovem amb màscares si s'ha superat el límit del teixit sa
+(50 ºC) o del malalt (80 ºC). Al primer cop que se supera aturem el mètode i
+interpolem entre les dues últimes iteracions per trobar el temps exacte del creuament.
+"""
+
+from dataclasses import astuple, dataclass
+
+import numpy as np
+
+from heartless.malla import es_uniforme
+from heartless.memoria_cau import memoria_cau
+from heartless.normalitzacio import normalitza_temperatura
+from heartless.utils import limits_teixit
+
+
+@dataclass(frozen=True)
+class LimitTractament:
+    """Resultat de la vigilància dels límits
+
+    Attributes
+    ----------
+    superat : bool
+        Si algun punt ha superat el seu límit abans d'acabar el mètode
+    iteracio : int
+        Última iteració que compleix les condicions
+    temps : float
+        Temps normalitzat del creuament (interpolat), o l'últim temps si no se supera
+    posicio : int
+        Índex de la posició on se supera primer el límit (-1 si no se supera)
+    """
+
+    superat: bool
+    iteracio: int
+    temps: float
+    posicio: int
+
+
+def monitoritza_limits(
+    iterador, limits: np.ndarray | None = None, x: np.ndarray | None = None
+) -> LimitTractament:
+    """Consumeix un generador de mètode fins que se supera algun límit de temperatura
+
+    Parameters
+    ----------
+    iterador : Iterator[tuple[int, float, np.ndarray]]
+        Generador d'un mètode, amb temperatures normalitzades (d'un sol escenari)
+    limits : np.ndarray, optional
+        Límit de cada posició en ºC (per defecte `limits_teixit()`)
+    x : np.ndarray, optional
+        Posicions normalitzades si la malla no és uniforme, per calcular els límits per defecte
+
+    Returns
+    -------
+    LimitTractament
+    """
+    lim = None
+    anterior = None
+    superat = None
+    i_ant, t_ant = 0, 0.0
+
+    for i, t, T in iterador:
+        if lim is None:
+            if np.ndim(T) > 1:
+                raise ValueError(
+                    "La vigilància dels límits no admet diversos escenaris a la vegada"
+                )
+            if limits is None:
+                limits = limits_teixit(len(T), x)
+            lim = normalitza_temperatura(np.asarray(limits, dtype=np.float64))
+            anterior = np.empty_like(T)
+            superat = np.empty(len(T), dtype=bool)
+
+        np.greater(T, lim, out=superat)
+        if superat.any():
+            if i == 0:
+                return LimitTractament(True, 0, t, int(np.argmax(superat)))
+
+            # Interpolació lineal de cada punt superat entre les dues últimes iteracions:
+            # T_ant + f (T - T_ant) = lim  ->  f = (lim - T_ant) / (T - T_ant)
+            idx = np.nonzero(superat)[0]
+            fraccio = (lim[idx] - anterior[idx]) / (T[idx] - anterior[idx])
+            k = int(np.argmin(fraccio))
+            temps = t_ant + fraccio[k] * (t - t_ant)
+            # L'iterador s'atura aquí, no cal calcular la resta d'iteracions
+            return LimitTractament(True, i_ant, float(temps), int(idx[k]))
+
+        # Els generadors reutilitzen els vectors, guardem una còpia per interpolar
+        np.copyto(anterior, T)
+        i_ant, t_ant = i, t
+
+    return LimitTractament(False, i_ant, t_ant, -1)
+
+
+def limit_metode(metode: str, itera_metode, dx, dt, t_cos=None) -> LimitTractament:
+    """`monitoritza_limits` d'un mètode, llegit de la memòria cau si ja s'havia calculat
+
+    Parameters
+    ----------
+    metode : str
+        Nom del mètode (forma part de la clau de la memòria cau)
+    itera_metode : Callable
+        Generador del mètode (`itera_euler_explicit`, `itera_euler_implicit`...)
+    dx, dt : float
+        Increments normalitzats (`dx` pot ser les posicions d'una malla no uniforme)
+    t_cos : float, optional
+        Temperatura del cos en ºC
+
+    Returns
+    -------
+    LimitTractament
+    """
+
+    def calcula(dx, dt, t_cos):
+        x = None if es_uniforme(dx) else dx
+        limit = monitoritza_limits(itera_metode(dx, dt, t_cos), x=x)
+        return np.array(astuple(limit), dtype=np.float64)
+
+    superat, iteracio, temps, posicio = memoria_cau.calcula(
+        f"limit-{metode}", calcula, dx=dx, dt=dt, t_cos=t_cos
+    ).tolist()
+    return LimitTractament(bool(superat), int(iteracio), temps, int(posicio))
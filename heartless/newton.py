@@ -0,0 +1,354 @@
+"""
+Propietats dependents de la temperatura: Euler Implícit i Crank-Nicolson no lineals
+
+Durant l'ablació la conductivitat tèrmica i l'elèctrica del teixit augmenten amb la temperatura.
+Amb `K(T)` i `CONDUCTIVITAT(T)` l'operador `L(T) T + font(T)` de `heartless.teixit` depèn
+de la temperatura i cada pas de l'esquema theta (theta = 1 Euler Implícit, 1/2 Crank-Nicolson)
+és un sistema no lineal
+
+    F(U) = U - T - theta dt (L(U) U + font(U)) - (1 - theta) dt (L(T) T + font(T)) = 0
+
+que resolem amb el mètode de Newton, `J(U) dU = -F(U)`. Cada node només depèn dels seus dos
+veïns, així que el jacobià és tridiagonal i cada iteració és O(N) (`factoritza_tridiagonal`).
+La font també depèn de totes les temperatures a través de la resistència total `R`; aquest
+acoblament és molt feble (cada node hi contribueix amb el seu `dx`) i no el posem al jacobià.
+
+Amb el jacobià retardat, la factorització es reutilitza (entre iteracions i entre passos)
+mentre el residu es redueixi prou a cada iteració; només es torna a factoritzar quan no.
+Amb `ALFA_K = ALFA_CONDUCTIVITAT = 0` és el model lineal i Newton convergeix en una iteració.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.captures import (
+    Captures,
+    nombre_iteracions,
+    recull_captures,
+    temps_captures,
+)
+from heartless.configuracio import constants, settings
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.escenaris import estat_inicial, prepara_escenaris
+from heartless.malla import coeficients_laplacia, dx_configurat, nodes, pas_minim
+from heartless.normalitzacio import desnormalitza_temperatura, normalitza_temperatura
+from heartless.teixit import PropietatsTeixit, operador_teixit, propietats_teixit
+from heartless.tridiagonal import factoritza_tridiagonal
+
+THETA = {"implicit": 1.0, "crank": 0.5}
+
+# Iteracions màximes de Newton per pas
+MAX_ITERACIONS = 30
+
+# Amb el jacobià retardat, es torna a factoritzar si el residu no es divideix almenys per 4
+CONTRACCIO_MAXIMA = 0.25
+
+
+@dataclass(frozen=True)
+class DependenciaLineal:
+    """Propietat relativa al seu valor a `T_COS`, `1 + alfa (T - T_COS)` amb T en ºC
+
+    Qualsevol objecte amb els mètodes `valor` i `derivada` es pot fer servir en lloc seu.
+
+    Attributes
+    ----------
+    alfa : float
+        Variació relativa per ºC
+    """
+
+    alfa: float = 0.0
+
+    def valor(self, T: np.ndarray) -> np.ndarray:
+        """Factor de la propietat a cada temperatura normalitzada"""
+        factor = 1 + self.alfa * (desnormalitza_temperatura(T) - constants.T_COS)
+        if np.any(factor <= 0):
+            raise ValueError("La propietat dependent de la temperatura ha de ser positiva")
+        return factor
+
+    def derivada(self, T: np.ndarray) -> np.ndarray:
+        """Derivada del factor respecte la temperatura normalitzada"""
+        return np.full_like(T, self.alfa * desnormalitza_temperatura(1.0))
+
+
+@dataclass(frozen=True)
+class ResultatNewton:
+    """Resultat d'una execució amb propietats dependents de la temperatura
+
+    Attributes
+    ----------
+    temperatures : np.ndarray
+        Temperatures normalitzades (captures x N)
+    iteracions : np.ndarray
+        Iteracions de Newton de cada pas
+    residus : np.ndarray
+        Residu final de cada pas (ºC)
+    factoritzacions : int
+        Jacobians factoritzats en total
+    """
+
+    temperatures: np.ndarray
+    iteracions: np.ndarray
+    residus: np.ndarray
+    factoritzacions: int
+
+
+def operador_no_lineal(
+    x,
+    T: np.ndarray,
+    font: float,
+    conductivitat_termica,
+    conductivitat_electrica,
+    base: PropietatsTeixit | None = None,
+    jacobia: bool = False,
+):
+    """`L(T) T + font(T)` a cada node interior i, opcionalment, el seu jacobià tridiagonal
+
+    Parameters
+    ----------
+    x : array_like
+        Posicions normalitzades dels nodes
+    T : np.ndarray
+        Temperatures normalitzades de tots els nodes (extrems inclosos)
+    font : float
+        Font de calor de l'escenari (veure `prepara_escenaris`)
+    conductivitat_termica, conductivitat_electrica : DependenciaLineal
+        Dependència de cada propietat amb la temperatura
+    base : PropietatsTeixit, optional
+        Propietats de cada node a `T_COS` (per defecte `propietats_teixit(x)`)
+    jacobia : bool
+        Si també es calculen les diagonals del jacobià
+
+    Returns
+    -------
+    np.ndarray | tuple[np.ndarray, tuple[np.ndarray, np.ndarray, np.ndarray]]
+        Operador a cada node interior i, si `jacobia`, les derivades de cada node
+        respecte el veí esquerre, ell mateix i el veí dret (mida `len(x) - 2`)
+    """
+    if base is None:
+        base = propietats_teixit(x)
+    factor_k = conductivitat_termica.valor(T)
+    factor_sigma = conductivitat_electrica.valor(T)
+    k = base.conductivitat_termica * factor_k
+    esq, centre, dreta, font_node = operador_teixit(
+        x,
+        PropietatsTeixit(k, base.capacitat, base.conductivitat_electrica * factor_sigma),
+    )
+    calor = font * font_node
+    G = esq * T[:-2] + centre * T[1:-1] + dreta * T[2:] + calor
+    if not jacobia:
+        return G
+
+    # El flux de cada cara és `k_cara (T[j+1] - T[j])`, amb `k_cara` la mitjana harmònica:
+    # a més dels coeficients, cal derivar `k_cara` respecte la temperatura dels dos nodes
+    c = base.capacitat[1:-1]
+    geo_esq, _, geo_dreta = coeficients_laplacia(x)
+    geo_esq, geo_dreta = geo_esq / c, geo_dreta / c
+    dk = base.conductivitat_termica * conductivitat_termica.derivada(T)
+    k_esq, k_dret = k[:-1], k[1:]
+    suma = (k_esq + k_dret) ** 2
+    salt = np.diff(T)
+    d_esq = salt * 2 * k_dret * k_dret / suma * dk[:-1]
+    d_dret = salt * 2 * k_esq * k_esq / suma * dk[1:]
+
+    # Derivada local de la font: `font_node` és proporcional a `1 / sigma` del node
+    d_font = -calor * conductivitat_electrica.derivada(T[1:-1]) / factor_sigma[1:-1]
+
+    inferior = esq - geo_esq * d_esq[:-1]
+    diagonal = centre + geo_dreta * d_esq[1:] - geo_esq * d_dret[:-1] + d_font
+    superior = dreta + geo_dreta * d_dret[1:]
+    return G, (inferior, diagonal, superior)
+
+
+def itera_newton(
+    esquema: str,
+    dx,
+    dt,
+    t_cos=None,
+    voltatge=None,
+    conductivitat_termica=None,
+    conductivitat_electrica=None,
+    tolerancia=None,
+    jacobia_retardat=None,
+    estat=None,
+):
+    """Generador d'Euler Implícit o Crank-Nicolson amb propietats dependents de la temperatura
+
+    Parameters
+    ----------
+    esquema : str
+        "implicit" (Euler Implícit) o "crank" (Crank-Nicolson)
+    dx : float | array_like
+        Increment normalitzat, o les posicions d'una malla no uniforme (veure `heartless.malla`)
+    dt : float
+        Increment de temps normalitzat
+    t_cos, voltatge : float, optional
+        Escenari (només un, cada escenari tindria un jacobià diferent)
+    conductivitat_termica, conductivitat_electrica : DependenciaLineal, optional
+        Dependència amb la temperatura (per defecte `ALFA_K` i `ALFA_CONDUCTIVITAT`)
+    tolerancia : float, optional
+        Residu màxim en ºC (per defecte `settings.tolerancia_newton`)
+    jacobia_retardat : bool, optional
+        Si es reutilitza el jacobià factoritzat (per defecte `settings.jacobia_retardat`)
+    estat : dict, optional
+        Si es dona, s'hi guarden les "iteracions" i els "residus" (ºC) de cada pas
+        i el nombre de "factoritzacions"
+
+    Yields
+    ------
+    tuple[int, float, np.ndarray]
+        Iteració, temps normalitzat i temperatures normalitzades (el vector es reutilitza)
+    """
+    if esquema not in THETA:
+        raise ValueError(f"Esquema desconegut: '{esquema}'")
+    theta = THETA[esquema]
+    if conductivitat_termica is None:
+        conductivitat_termica = DependenciaLineal(constants.ALFA_K)
+    if conductivitat_electrica is None:
+        conductivitat_electrica = DependenciaLineal(constants.ALFA_CONDUCTIVITAT)
+    if tolerancia is None:
+        tolerancia = settings.tolerancia_newton
+    if jacobia_retardat is None:
+        jacobia_retardat = settings.jacobia_retardat
+    tol = normalitza_temperatura(tolerancia)
+    if estat is None:
+        estat = {}
+    estat["iteracions"] = []
+    estat["residus"] = []
+    estat["factoritzacions"] = 0
+
+    T_c, font = prepara_escenaris(t_cos, voltatge)
+    if np.ndim(T_c) or np.ndim(font):
+        raise ValueError("El mètode de Newton no admet diversos escenaris a la vegada")
+
+    x = nodes(dx)
+    base = propietats_teixit(x)
+
+    def avalua(T, jacobia=False):
+        return operador_no_lineal(
+            x, T, font, conductivitat_termica, conductivitat_electrica, base, jacobia
+        )
+
+    T = estat_inicial(T_c, len(x))
+    U = T.copy()
+    # Crank-Nicolson tracta els extrems de la part implícita igual que el model lineal:
+    # sense terme de contorn, com si el node extrem tingués la temperatura del seu veí
+    fantasma = esquema == "crank"
+    yield 0, 0.0, T
+
+    A = None
+    for i in range(1, nombre_iteracions(dt)):
+        # Part explícita del pas, que no canvia durant les iteracions
+        anterior = T[1:-1].copy()
+        if theta < 1:
+            anterior += (1 - theta) * dt * avalua(T)
+
+        U[1:-1] = T[1:-1]
+        residu_anterior = None
+        refactoritza = A is None or not jacobia_retardat
+        for iteracio in range(MAX_ITERACIONS + 1):
+            if fantasma:
+                U[0], U[-1] = U[1], U[-2]
+            if refactoritza:
+                G, (inferior, diagonal, superior) = avalua(U, jacobia=True)
+                if fantasma:
+                    diagonal[0] += inferior[0]
+                    diagonal[-1] += superior[-1]
+            else:
+                G = avalua(U)
+            F = U[1:-1] - anterior - theta * dt * G
+            residu = float(np.max(np.abs(F)))
+            if residu <= tol:
+                break
+            if iteracio == MAX_ITERACIONS:
+                raise ValueError(
+                    f"Newton no convergeix en {MAX_ITERACIONS} iteracions (t = {i * dt}), "
+                    "redueix dt"
+                )
+
+            if refactoritza:
+                A = factoritza_tridiagonal(
+                    -theta * dt * inferior[1:],
+                    1 - theta * dt * diagonal,
+                    -theta * dt * superior[:-1],
+                )
+                estat["factoritzacions"] += 1
+            np.negative(F, out=F)
+            U[1:-1] += A.resol(F, out=F)
+
+            # Sense jacobià retardat es factoritza a cada iteració (Newton exacte)
+            refactoritza = not jacobia_retardat or (
+                residu_anterior is not None and residu > CONTRACCIO_MAXIMA * residu_anterior
+            )
+            residu_anterior = residu
+
+        U[0], U[-1] = T[0], T[-1]
+        T, U = U, T
+        estat["iteracions"].append(iteracio)
+        estat["residus"].append(float(desnormalitza_temperatura(residu)))
+        yield i, i * dt, T
+
+
+def metode_newton(
+    esquema: str,
+    dx,
+    dt,
+    t_cos=None,
+    captures: Captures | None = None,
+    voltatge=None,
+    **opcions,
+) -> ResultatNewton:
+    """Executa `itera_newton` i guarda les captures i les iteracions de cada pas
+
+    `opcions` són els arguments opcionals de `itera_newton`.
+    """
+    estat = {}
+    temperatures = recull_captures(
+        itera_newton(esquema, dx, dt, t_cos, voltatge, estat=estat, **opcions), dt, captures
+    )
+    return ResultatNewton(
+        temperatures,
+        np.array(estat["iteracions"], dtype=np.int64),
+        np.array(estat["residus"], dtype=np.float64),
+        estat["factoritzacions"],
+    )
+
+
+def executa_sequencia_newton(context=None):
+    """Executa Euler Implícit i Crank-Nicolson amb propietats dependents de la temperatura
+
+    Es fa servir el dt més petit de cada mètode i es guarden com `<fitxer>_newton`,
+    amb les iteracions i el residu de cada pas a les metadades.
+    """
+    print("Executant mètodes no lineals (Newton)")
+    dx = dx_configurat()
+    h = pas_minim(dx)
+    captures = Captures(cada=settings.captures_cada)
+    for esquema, fitxer, llista_q in (
+        ("implicit", settings.fitxer_implicit, constants.T_implicit),
+        ("crank", settings.fitxer_crank, constants.T_crank),
+    ):
+        q = min(llista_q)
+        dt = q * h * h
+        result = metode_newton(esquema, dx, dt, captures=captures)
+        print(
+            f"{esquema}: {result.iteracions.mean():.2f} iteracions per pas "
+            f"(màxim {result.iteracions.max()}), residu màxim {result.residus.max():.3e} ºC, "
+            f"{result.factoritzacions} factoritzacions"
+        )
+
+        metadades = metadades_resultat(esquema, dt, q, temps_captures(dt, captures))
+        metadades["newton"] = {
+            "tolerancia": settings.tolerancia_newton,
+            "jacobia_retardat": settings.jacobia_retardat,
+            "factoritzacions": result.factoritzacions,
+            "iteracions": result.iteracions.tolist(),
+            "residus": result.residus.tolist(),
+        }
+        fitxer = f"{fitxer}_newton"
+        T = desnormalitza_temperatura(result.temperatures)
+        if context is not None:
+            context.afegeix(fitxer, T, metadades)
+        else:
+            guardar_resultat(T, len(T), fitxer, metadades)
+    print("Mètodes no lineals finalitzats")
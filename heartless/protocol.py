@@ -0,0 +1,192 @@
+"""
+Protocols de voltatge: el voltatge aplicat canvia amb el temps
+
+La font de calor normalitzada és `(V / constants.VOLTATGE)^2`. Amb un protocol, `V` depèn del temps,
+però la matriu dels esquemes no depèn de la font: només cal escalar el terme de font del terme
+independent a cada pas, sense tornar a factoritzar. Els mètodes (Euler Explícit, Euler Implícit
+i Crank-Nicolson) reben el protocol pel mateix paràmetre `voltatge`:
+
+- un `Protocol`, constant a trossos (`constant_a_trossos`) o en rampa (`rampa`),
+- qualsevol funció del temps en segons que retorni el voltatge en V,
+- un voltatge per cada instant de la malla temporal (`mostrejat`),
+- o una llista de protocols, que s'avancen tots a la vegada com a escenaris
+  (comparteixen la factorització, veure `heartless.escenaris`).
+
+Cada esquema avalua la font on la faria servir si fos constant: Euler Explícit a l'inici del pas,
+Euler Implícit al final i Crank-Nicolson la mitjana dels dos.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.captures import nombre_iteracions
+from heartless.configuracio import constants
+from heartless.escenaris import prepara_escenaris
+from heartless.normalitzacio import desnormalitza_temps
+
+
+@dataclass(frozen=True)
+class Protocol:
+    """Voltatge aplicat definit per punts
+
+    Abans del primer instant el voltatge és el primer, i després de l'últim, l'últim.
+
+    Attributes
+    ----------
+    temps : tuple[float, ...]
+        Instants en s, estrictament creixents
+    voltatges : tuple[float, ...]
+        Voltatge en V a partir de cada instant
+    rampa : bool
+        Si entre dos instants el voltatge canvia linealment (True) o es manté constant (False)
+    """
+
+    temps: tuple[float, ...]
+    voltatges: tuple[float, ...]
+    rampa: bool = False
+
+    def __post_init__(self):
+        if len(self.temps) == 0 or len(self.temps) != len(self.voltatges):
+            raise ValueError("El protocol ha de tenir el mateix nombre (no nul) d'instants i voltatges")
+        if np.any(np.diff(self.temps) <= 0):
+            raise ValueError("Els instants del protocol han de ser estrictament creixents")
+
+    def __call__(self, t) -> np.ndarray:
+        """Voltatge en V a cada temps `t` (en s)"""
+        t = np.asarray(t, dtype=np.float64)
+        voltatges = np.asarray(self.voltatges, dtype=np.float64)
+        if self.rampa:
+            return np.interp(t, self.temps, voltatges)
+        k = np.searchsorted(self.temps, t, side="right") - 1
+        return voltatges[np.clip(k, 0, len(voltatges) - 1)]
+
+
+def constant_a_trossos(temps, voltatges) -> Protocol:
+    """Protocol que aplica `voltatges[k]` des de `temps[k]` (en s) fins a l'instant següent"""
+    return Protocol(tuple(map(float, temps)), tuple(map(float, voltatges)))
+
+
+def rampa(temps, voltatges) -> Protocol:
+    """Protocol que interpola linealment els `voltatges` entre els `temps` (en s)"""
+    return Protocol(tuple(map(float, temps)), tuple(map(float, voltatges)), rampa=True)
+
+
+def mostrejat(voltatges, dt: float) -> Protocol:
+    """Protocol amb un voltatge per cada instant de la malla temporal de pas `dt` (normalitzat)"""
+    voltatges = np.asarray(voltatges, dtype=np.float64)
+    n = nombre_iteracions(dt)
+    if voltatges.shape != (n,):
+        raise ValueError(
+            f"El protocol mostrejat ha de tenir {n} voltatges (un per iteració), no {voltatges.shape}"
+        )
+    return constant_a_trossos(desnormalitza_temps(np.arange(n) * dt), voltatges)
+
+
+def es_protocol(voltatge) -> bool:
+    """Si `voltatge` és un protocol o una llista de protocols (i no voltatges constants)"""
+    if callable(voltatge):
+        return True
+    return (
+        isinstance(voltatge, (list, tuple))
+        and len(voltatge) > 0
+        and all(callable(v) for v in voltatge)
+    )
+
+
+def fonts_protocol(protocol, dt: float) -> np.ndarray:
+    """Font de calor normalitzada a cada instant de la malla temporal de pas `dt`"""
+    temps = desnormalitza_temps(np.arange(nombre_iteracions(dt)) * dt)
+    if isinstance(protocol, Protocol):
+        V = protocol(temps)
+    else:
+        # Una funció qualsevol pot no acceptar arrays
+        V = np.vectorize(protocol, otypes=[np.float64])(temps)
+    return (V / constants.VOLTATGE) ** 2
+
+
+def prepara_protocol(t_cos, voltatge, dt: float, esquema: str):
+    """Com `prepara_escenaris`, però `voltatge` també pot ser un protocol o una llista de protocols
+
+    Parameters
+    ----------
+    t_cos, voltatge : optional
+        Escenaris (veure `prepara_escenaris`) o protocols de voltatge
+    dt : float
+        Increment de temps normalitzat
+    esquema : str
+        "explicit", "implicit" o "crank", per saber en quin instant s'avalua la font de cada pas
+
+    Returns
+    -------
+    tuple
+        Temperatura dels extrems, font de calor (uns si hi ha protocols) i l'escala de la font
+        de cada pas `i`: None sense protocols, de forma (iteracions,) amb un protocol
+        o (iteracions, escenaris, 1) amb una llista
+    """
+    if not es_protocol(voltatge):
+        return (*prepara_escenaris(t_cos, voltatge), None)
+
+    protocols = [voltatge] if callable(voltatge) else list(voltatge)
+    fonts = np.array([fonts_protocol(p, dt) for p in protocols])
+    escala = np.empty_like(fonts)
+    escala[:, 0] = fonts[:, 0]
+    if esquema == "explicit":
+        escala[:, 1:] = fonts[:, :-1]
+    elif esquema == "implicit":
+        escala[:, 1:] = fonts[:, 1:]
+    elif esquema == "crank":
+        escala[:, 1:] = (fonts[:, :-1] + fonts[:, 1:]) / 2
+    else:
+        raise ValueError(f"Esquema desconegut: '{esquema}'")
+
+    if callable(voltatge):
+        T_c, font = prepara_escenaris(t_cos)
+        return T_c, np.ones_like(font) if np.ndim(font) else 1.0, escala[0]
+
+    T_c, font = prepara_escenaris(t_cos, np.full(len(protocols), constants.VOLTATGE))
+    return T_c, font, np.ascontiguousarray(escala.T[:, :, np.newaxis])
+
+
+class FontProtocol:
+    """Terme de font de cada pas: el terme constant `a` escalat pel protocol
+
+    Sense protocol retorna sempre `a`. Amb protocol, el resultat s'escriu sempre al mateix
+    vector, així que els bucles dels mètodes continuen sense reservar memòria.
+
+    Parameters
+    ----------
+    a : float | np.ndarray
+        Terme de font dels mètodes (`dt * font`, amb la font de `prepara_protocol`)
+    escala : np.ndarray | None
+        Escala de cada pas (veure `prepara_protocol`)
+    forma : tuple, optional
+        Forma de les temperatures, si `a` està aplanat amb `interior_pla`
+    """
+
+    def __init__(self, a, escala: np.ndarray | None, forma: tuple | None = None):
+        self.a = a
+        self.escala = escala
+        self._escenari = None
+        if escala is None or (escala.ndim == 1 and np.ndim(a) == 0):
+            return
+        if escala.ndim > 1 and forma is not None:
+            # Escenari de cada posició del vector aplanat `T.reshape(-1)[1:-1]`
+            self._escenari = np.arange(1, np.prod(forma) - 1) // forma[-1]
+            self._vector = np.empty(len(self._escenari), dtype=np.float64)
+        else:
+            self._vector = np.empty(
+                np.broadcast_shapes(np.shape(a), escala.shape[1:]), dtype=np.float64
+            )
+
+    def __call__(self, i: int):
+        if self.escala is None:
+            return self.a
+        escala = self.escala[i]
+        if self.escala.ndim == 1 and np.ndim(self.a) == 0:
+            return self.a * float(escala)
+        if self._escenari is not None:
+            # Amb mode="raise" (per defecte) `np.take` escriu a un vector temporal
+            np.take(escala.reshape(-1), self._escenari, out=self._vector, mode="clip")
+            return np.multiply(self._vector, self.a, out=self._vector)
+        return np.multiply(self.a, escala, out=self._vector)
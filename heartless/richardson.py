@@ -0,0 +1,171 @@
+"""
+Extrapolació de Richardson dels mètodes en diferències finites
+
+Un mètode d'ordre p amb pas dt té un error `C dt^p + O(dt^(p+1))`. Executant-lo
+amb dt i dt/2 i combinant les captures als mateixos temps,
+`R = T[dt/2] + (T[dt/2] - T[dt]) / (2^p - 1)` elimina el terme principal de l'error.
+La correcció `|R - T[dt/2]|` és una estimació a posteriori de l'error de l'execució fina,
+no de R (que és d'ordre superior i sovint molt més petit): amb dos nivells no n'hi ha cap de R.
+
+Amb tres nivells (dt, dt/2, dt/4) les dues extrapolacions R1 i R2 es tornen a extrapolar
+amb ordre p+1, i `|R2 - R1| / (2^(p+1) - 1)` (l'error estimat de R2) és una estimació
+conservadora de l'error del resultat, sempre que l'error de cada nivell es comporti com `C dt^p`
+(si l'ordre real és menor, com passa a Crank-Nicolson prop dels extrems, la pot subestimar).
+Cada nivell passa per la memòria cau de resultats, així que refer-ho és gratuït.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.bdf2 import bdf2
+from heartless.captures import Captures, temps_captures
+from heartless.configuracio import constants, settings
+from heartless.crank import crank_nicolson
+from heartless.emmagatzematge import guardar_resultat, metadades_resultat
+from heartless.explicit import euler_explicit
+from heartless.implicit import euler_implicit
+from heartless.malla import dx_configurat, pas_minim
+from heartless.memoria_cau import memoria_cau
+from heartless.normalitzacio import desnormalitza_temperatura
+from heartless.tr_bdf2 import tr_bdf2
+
+# Ordre de precisió temporal de cada mètode
+ORDRES = {
+    euler_explicit: 1,
+    euler_implicit: 1,
+    crank_nicolson: 2,
+    bdf2: 2,
+    tr_bdf2: 2,
+}
+
+
+@dataclass(frozen=True)
+class ResultatRichardson:
+    """Resultat extrapolat
+
+    Attributes
+    ----------
+    temps : np.ndarray
+        Temps normalitzat de cada captura
+    temperatures : np.ndarray
+        Temperatures normalitzades extrapolades (captures x N)
+    error_fi : np.ndarray
+        Estimació a posteriori de l'error de cada punt del nivell més fi (no extrapolat),
+        normalitzada i amb la mateixa forma
+    error : np.ndarray | None
+        Estimació (conservadora) de l'error de cada punt de `temperatures`;
+        només n'hi ha amb tres nivells
+    """
+
+    temps: np.ndarray
+    temperatures: np.ndarray
+    error_fi: np.ndarray
+    error: np.ndarray | None = None
+
+
+def richardson(
+    metode,
+    dx,
+    dt,
+    t_cos=None,
+    captures: Captures | None = None,
+    voltatge=None,
+    nivells: int = 2,
+    ordre: int | None = None,
+) -> ResultatRichardson:
+    """Executa un mètode amb dt, dt/2 (i dt/4) i n'extrapola les captures
+
+    Parameters
+    ----------
+    metode : Callable
+        Mètode amb la crida `metode(dx, dt, t_cos, captures, voltatge)`
+        (`euler_implicit`, `crank_nicolson`...)
+    dx, dt : float
+        Increments normalitzats del nivell més gruixut
+    t_cos, voltatge : optional
+        Escenaris, com als mètodes
+    captures : Captures, optional
+        Captures del nivell gruixut (per defecte totes les iteracions);
+        els nivells fins es capturen exactament als mateixos temps
+    nivells : int
+        2 (dt, dt/2) o 3 (dt, dt/2, dt/4)
+    ordre : int, optional
+        Ordre del mètode (per defecte el de `ORDRES`)
+
+    Returns
+    -------
+    ResultatRichardson
+    """
+    if nivells not in (2, 3):
+        raise ValueError(f"`nivells` ha de ser 2 o 3, no {nivells}")
+    if ordre is None:
+        ordre = ORDRES[metode]
+
+    temps = temps_captures(dt, captures)
+    # Els temps són múltiples de dt, per tant també dels dt més fins
+    alineades = Captures(temps=tuple(temps.tolist()))
+
+    def nivell(k):
+        dt_k = dt / 2**k
+        if voltatge is None:
+            return memoria_cau.resultat_metode(
+                metode.__name__, metode, dx, dt_k, t_cos, alineades
+            )
+        return metode(dx, dt_k, t_cos, alineades, voltatge)
+
+    resultats = [nivell(k) for k in range(nivells)]
+
+    def extrapola(gros, fi, p):
+        return fi + (fi - gros) / (2**p - 1)
+
+    R1 = extrapola(resultats[0], resultats[1], ordre)
+    if nivells == 2:
+        # Només podem estimar l'error de l'execució fina, no el de R
+        return ResultatRichardson(temps, R1, np.abs(R1 - resultats[1]))
+
+    R2 = extrapola(resultats[1], resultats[2], ordre)
+    R = extrapola(R1, R2, ordre + 1)
+    # `|R - R2| = |R2 - R1| / (2^(p+1) - 1)` és l'error de R2, més gran que el de R
+    return ResultatRichardson(temps, R, np.abs(R2 - resultats[2]), np.abs(R - R2))
+
+
+def executa_sequencia_richardson(context=None):
+    """Executa Euler Implícit i Crank-Nicolson amb extrapolació de Richardson i guarda els resultats
+
+    Es parteix del dt més petit de cada mètode amb tres nivells (dt, dt/2, dt/4) i es guarden
+    com `<fitxer>_richardson`, amb l'estimació de l'error de cada punt (en ºC) a `<fitxer>_richardson_error`.
+    """
+    print("Executant extrapolació de Richardson")
+    dx = dx_configurat()
+    h = pas_minim(dx)
+    captures = Captures(cada=settings.captures_cada)
+    for nom, metode, fitxer, llista_q in (
+        ("implicit", euler_implicit, settings.fitxer_implicit, constants.T_implicit),
+        ("crank", crank_nicolson, settings.fitxer_crank, constants.T_crank),
+    ):
+        q = min(llista_q)
+        dt = q * h * h
+        result = richardson(metode, dx, dt, captures=captures, nivells=3)
+        error = desnormalitza_temperatura(result.error)
+        error_fi = float(desnormalitza_temperatura(result.error_fi).max())
+        print(
+            f"{nom}: error estimat màxim {error.max():.3e} ºC "
+            f"(sense extrapolar, amb dt/4: {error_fi:.3e} ºC)"
+        )
+
+        metadades = metadades_resultat(nom, dt, q, result.temps)
+        metadades["richardson"] = {
+            "nivells": 3,
+            "error_maxim": float(error.max()),
+            "error_maxim_fi": error_fi,
+        }
+        for nom_fitxer, T in (
+            (f"{fitxer}_richardson", desnormalitza_temperatura(result.temperatures)),
+            (f"{fitxer}_richardson_error", error),
+        ):
+            if context is not None:
+                context.afegeix(nom_fitxer, T, metadades)
+            else:
+                guardar_resultat(T, len(T), nom_fitxer, metadades)
+    print("Extrapolació de Richardson finalitzada")
@@ -0,0 +1,162 @@
+"""
+Propietats del teixit a cada node: teixit sa i malalt amb valors diferents
+
+`Constants` té els valors del teixit sa (`K`, `RHO`, `C_V`, `CONDUCTIVITAT`) i, opcionalment,
+els del teixit malalt (`K_mal`, `RHO_mal`, `C_V_mal`, `CONDUCTIVITAT_mal`; None vol dir
+el mateix valor que el sa). Normalitzem amb els valors del teixit sa, així que un teixit
+homogeni és exactament el problema de sempre.
+
+Amb propietats variables l'equació normalitzada és
+
+    c(x) dT/dt = d/dx (k(x) dT/dx) + font(x)
+
+on `c = RHO C_V`, `k` i `sigma` són relatius als del teixit sa. Discretitzem la derivada
+en forma conservativa: a cada cara entre dos nodes la conductivitat és la mitjana harmònica
+(la que conserva el flux de calor a través de la frontera sa-malalt), i
+
+    dT_j/dt = 2 / (c_j (h_e + h_d)) * (k_d (T[j+1] - T[j]) / h_d - k_e (T[j] - T[j-1]) / h_e) + font_j / c_j
+
+que amb `k = c = 1` és la segona derivada de `heartless.malla`. Els elèctrodes són als extrems,
+així que el corrent travessa els teixits en sèrie: la densitat de corrent és la mateixa a tot arreu
+i la font de cada node és `1 / (sigma_j R^2)`, amb `R` la resistència normalitzada `integral de dx / sigma`
+(1 si el teixit és homogeni).
+
+Totes les diagonals es calculen amb operacions vectoritzades de NumPy, sense bucles de Python.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from heartless.configuracio import constants
+from heartless.malla import coeficients_laplacia, es_uniforme, fronteres_teixit, nodes
+
+
+@dataclass(frozen=True)
+class PropietatsTeixit:
+    """Propietats de cada node, relatives a les del teixit sa
+
+    Attributes
+    ----------
+    conductivitat_termica : np.ndarray
+        `K / constants.K`
+    capacitat : np.ndarray
+        `RHO C_V / (constants.RHO constants.C_V)`
+    conductivitat_electrica : np.ndarray
+        `CONDUCTIVITAT / constants.CONDUCTIVITAT`
+    """
+
+    conductivitat_termica: np.ndarray
+    capacitat: np.ndarray
+    conductivitat_electrica: np.ndarray
+
+
+def valor_malalt(nom: str) -> float:
+    """Valor d'una constant al teixit malalt (`<nom>_mal`, o el del sa si és None)"""
+    valor = getattr(constants, f"{nom}_mal")
+    return getattr(constants, nom) if valor is None else valor
+
+
+def es_homogeni() -> bool:
+    """Si el teixit malalt té les mateixes propietats que el sa"""
+    return all(
+        valor_malalt(nom) == getattr(constants, nom)
+        for nom in ("K", "RHO", "C_V", "CONDUCTIVITAT")
+    )
+
+
+def propietats_teixit(x) -> PropietatsTeixit:
+    """Propietats relatives de cada node de la malla, per regions
+
+    Els nodes entre les dues fronteres (incloses) són teixit malalt.
+
+    Parameters
+    ----------
+    x : array_like
+        Posicions normalitzades dels nodes
+    """
+    x = np.asarray(x, dtype=np.float64)
+    esq, dret = fronteres_teixit()
+    malalt = (x >= esq) & (x <= dret)
+
+    def per_node(relatiu):
+        return np.where(malalt, relatiu, 1.0)
+
+    capacitat_malalt = (valor_malalt("RHO") * valor_malalt("C_V")) / (
+        constants.RHO * constants.C_V
+    )
+    return PropietatsTeixit(
+        conductivitat_termica=per_node(valor_malalt("K") / constants.K),
+        capacitat=per_node(capacitat_malalt),
+        conductivitat_electrica=per_node(
+            valor_malalt("CONDUCTIVITAT") / constants.CONDUCTIVITAT
+        ),
+    )
+
+
+def operador_teixit(x, propietats: PropietatsTeixit | None = None):
+    """Coeficients de l'operador (difusió i font) a cada node interior
+
+    Parameters
+    ----------
+    x : array_like
+        Posicions normalitzades dels nodes
+    propietats : PropietatsTeixit, optional
+        Propietats per node (per defecte `propietats_teixit(x)`); poden ser qualsevol vector
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Pes del veí esquerre, del node i del veí dret, i la font, de mida `len(x) - 2`
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if propietats is None:
+        propietats = propietats_teixit(x)
+    k = propietats.conductivitat_termica
+    c = propietats.capacitat[1:-1]
+    sigma = propietats.conductivitat_electrica
+
+    # Conductivitat de cada cara: mitjana harmònica dels dos nodes
+    k_cara = 2 * k[:-1] * k[1:] / (k[:-1] + k[1:])
+    esq, _, dreta = coeficients_laplacia(x)
+    esq = esq * k_cara[:-1] / c
+    dreta = dreta * k_cara[1:] / c
+
+    # Resistència normalitzada (regla del trapezi de 1 / sigma)
+    inversa = 1 / sigma
+    resistencia = np.sum((inversa[:-1] + inversa[1:]) / 2 * np.diff(x))
+    font = inversa[1:-1] / (resistencia * resistencia) / c
+    return esq, -(esq + dreta), dreta, font
+
+
+def operador_constant(dx) -> bool:
+    """Si els coeficients són els mateixos a tots els nodes (malla uniforme i teixit homogeni)
+
+    En aquest cas els mètodes fan servir els nuclis de sempre, amb `dt / dx^2`.
+    """
+    return es_uniforme(dx) and es_homogeni()
+
+
+def operador(dx):
+    """`operador_teixit` pels nodes d'un argument `dx` dels mètodes (veure `heartless.malla`)"""
+    return operador_teixit(nodes(dx))
+
+
+def font_nodes(dx) -> float | np.ndarray:
+    """Font relativa de cada node interior (1.0 si l'operador és constant)"""
+    if operador_constant(dx):
+        return 1.0
+    return operador(dx)[3]
+
+
+def pesos_contorn(dx, dt: float) -> tuple[float, float]:
+    """Pes de la temperatura de cada extrem en el primer i l'últim node interior, per `dt`
+
+    És el terme que els extrems afegeixen al terme independent dels esquemes implícits
+    (`dt / dx^2` a la malla uniforme amb el teixit homogeni).
+    """
+    if operador_constant(dx):
+        b = dt / (dx**2)
+        return b, b
+    esq, _, dreta, _ = operador(dx)
+    return dt * float(esq[0]), dt * float(dreta[-1])
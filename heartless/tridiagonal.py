@@ -0,0 +1,277 @@
+"""
+Resolució de sistemes tridiagonals (matrius en bandes) en O(N)
+
+Els mètodes implícits (Euler Implícit i Crank-Nicolson) resolen a cada pas de temps
+un sistema `A x = b` on `A` és tridiagonal i no canvia entre iteracions.
+Guardem només les tres diagonals, factoritzem `A = LU` una sola vegada
+(algorisme de Thomas) i a cada pas només fem la substitució endavant i enrere.
+
+Les factoritzacions es guarden en memòria per (esquema, N, dx, dt),
+de manera que executar el mateix mètode dues vegades no torna a factoritzar.
+En una malla no uniforme (`heartless.malla`) o amb propietats del teixit diferents
+a cada node (`heartless.teixit`) la matriu ja no és de Toeplitz, però continua sent
+tridiagonal i diagonalment dominant.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from itertools import product
+from math import prod
+
+import numpy as np
+
+from heartless.teixit import operador, operador_constant
+
+# Fins a quants sistemes alhora es resolen un per un amb floats de Python
+# (recórrer les files amb NumPy té un cost fix per fila que només compensa amb més sistemes;
+# amb N = 101 i N = 1001 s'igualen al voltant de 24)
+MAX_SISTEMES_ESCALARS = 16
+
+
+@dataclass(frozen=True)
+class FactoritzacioTridiagonal:
+    """Factorització LU d'una matriu tridiagonal sense pivotatge
+
+    Només és estable si la matriu és diagonalment dominant,
+    que és el cas de totes les matrius dels nostres esquemes.
+
+    Attributes
+    ----------
+    multiplicadors : np.ndarray
+        Diagonal inferior de L (la diagonal principal de L són uns), mida n-1
+    pivots : np.ndarray
+        Diagonal principal de U, mida n
+    superior : np.ndarray
+        Diagonal superior de U (igual que la de A), mida n-1
+    """
+
+    multiplicadors: np.ndarray
+    pivots: np.ndarray
+    superior: np.ndarray
+
+    @property
+    def n(self) -> int:
+        return len(self.pivots)
+
+    def resol(
+        self,
+        indep: np.ndarray,
+        out: np.ndarray | None = None,
+        treball: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Resol `A x = indep` amb la factorització ja calculada
+
+        L'eix 0 de `indep` és la dimensió del sistema; si té més eixos
+        es resolen tots els sistemes alhora (mateixa matriu, diferents b).
+        Fins a `MAX_SISTEMES_ESCALARS` sistemes es resolen un per un,
+        i amb més es fa la substitució fila a fila per tots alhora.
+
+        Parameters
+        ----------
+        indep : np.ndarray
+            Terme independent (b), de forma (n,) o (n, ...)
+        out : np.ndarray, optional
+            Array on escriure el resultat, pot ser el mateix `indep`
+        treball : np.ndarray, optional
+            Array contigu de la mateixa forma que `indep` on fer la substitució fila a fila
+            quan hi ha molts sistemes; si es reutilitza, no es reserva memòria a cada crida
+
+        Returns
+        -------
+        np.ndarray
+            Solució del sistema (x)
+        """
+        if out is None:
+            out = np.array(indep, dtype=np.float64, copy=True)
+        elif (out.ndim == 1 or treball is None) and out is not indep:
+            out[...] = indep
+
+        if out.ndim == 1:
+            # Amb un sol sistema és més ràpid treballar amb floats de Python
+            out[:] = self._resol_vector(out.tolist())
+            return out
+
+        sistemes = out.shape[1:]
+        if prod(sistemes) <= MAX_SISTEMES_ESCALARS:
+            # Amb pocs sistemes, un per un com si només n'hi hagués un
+            for k in product(*map(range, sistemes)):
+                columna = (slice(None), *k)
+                out[columna] = self._resol_vector(indep[columna].tolist())
+            return out
+
+        # Amb molts sistemes treballem amb files contigües (n, ...)
+        if treball is not None:
+            np.copyto(treball, indep)
+            x = treball
+        else:
+            x = np.ascontiguousarray(out)
+        l, u, c = self._diagonals_llista
+        fila = np.empty(sistemes, dtype=np.float64)
+
+        # Substitució endavant: L y = b
+        for i in range(1, self.n):
+            np.multiply(x[i - 1], l[i - 1], out=fila)
+            np.subtract(x[i], fila, out=x[i])
+
+        # Substitució enrere: U x = y
+        x[-1] /= u[-1]
+        for i in range(self.n - 2, -1, -1):
+            np.multiply(x[i + 1], c[i], out=fila)
+            np.subtract(x[i], fila, out=x[i])
+            np.divide(x[i], u[i], out=x[i])
+
+        if x is not out:
+            np.copyto(out, x)
+        return out
+
+    @cached_property
+    def _diagonals_llista(self):
+        return (
+            self.multiplicadors.tolist(),
+            self.pivots.tolist(),
+            self.superior.tolist(),
+        )
+
+    def _resol_vector(self, x: list[float]) -> list[float]:
+        l, u, c = self._diagonals_llista
+        n = len(x)
+
+        # Substitució endavant: L y = b
+        for i in range(1, n):
+            x[i] -= l[i - 1] * x[i - 1]
+
+        # Substitució enrere: U x = y
+        x[-1] /= u[-1]
+        for i in range(n - 2, -1, -1):
+            x[i] = (x[i] - c[i] * x[i + 1]) / u[i]
+        return x
+
+
+def factoritza_tridiagonal(
+    inferior: np.ndarray, diagonal: np.ndarray, superior: np.ndarray
+) -> FactoritzacioTridiagonal:
+    """Factoritza una matriu tridiagonal guardada per diagonals
+
+    Parameters
+    ----------
+    inferior : np.ndarray
+        Diagonal inferior, `A[i+1, i]`, mida n-1
+    diagonal : np.ndarray
+        Diagonal principal, `A[i, i]`, mida n
+    superior : np.ndarray
+        Diagonal superior, `A[i, i+1]`, mida n-1
+
+    Returns
+    -------
+    FactoritzacioTridiagonal
+    """
+    inferior = np.asarray(inferior, dtype=np.float64)
+    superior = np.array(superior, dtype=np.float64, copy=True)
+    pivots = np.array(diagonal, dtype=np.float64, copy=True)
+    multiplicadors = np.zeros(len(inferior), dtype=np.float64)
+
+    for i in range(1, len(pivots)):
+        multiplicadors[i - 1] = inferior[i - 1] / pivots[i - 1]
+        pivots[i] -= multiplicadors[i - 1] * superior[i - 1]
+
+    # Les factoritzacions es comparteixen, no volem que es modifiquin
+    for arr in (multiplicadors, pivots, superior):
+        arr.flags.writeable = False
+    return FactoritzacioTridiagonal(multiplicadors, pivots, superior)
+
+
+def diagonals_esquema(esquema: str, n: int, dx, dt: float):
+    """Diagonals de la matriu `A` (nodes interiors) de cada esquema implícit
+
+    Parameters
+    ----------
+    esquema : str
+        "implicit" (Euler Implícit) o "crank" (Crank-Nicolson)
+    n : int
+        Nombre total de nodes, incloent els extrems (constants.N)
+    dx : float | array_like
+        Increment normalitzat, o les posicions d'una malla no uniforme (veure `heartless.malla`)
+    dt : float
+        Increment de temps normalitzat
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        Diagonal inferior, principal i superior
+    """
+    if not operador_constant(dx):
+        esq, centre, dreta, _ = operador(dx)
+        return diagonals_operador(esquema, esq, centre, dreta, dt)
+
+    n_interior = n - 2
+    if esquema == "implicit":
+        b = dt / (dx * dx)
+        diagonal = np.full(n_interior, 1 + 2 * b, dtype=np.float64)
+    elif esquema == "crank":
+        b = dt / (2 * dx * dx)
+        diagonal = np.full(n_interior, 1 + 2 * b, dtype=np.float64)
+        # Els extrems (inicial i final) són diferents
+        diagonal[0] -= b
+        diagonal[-1] -= b
+    else:
+        raise ValueError(f"Esquema desconegut: '{esquema}'")
+
+    fora = np.full(n_interior - 1, -b, dtype=np.float64)
+    return fora, diagonal, fora.copy()
+
+
+def diagonals_operador(esquema: str, esq, centre, dreta, dt: float):
+    """Diagonals de `A = I - theta dt L` per un operador L amb coeficients per node
+
+    Parameters
+    ----------
+    esquema : str
+        "implicit" (theta = 1) o "crank" (theta = 1/2)
+    esq, centre, dreta : np.ndarray
+        Pesos del veí esquerre, del node i del veí dret a cada node interior
+        (veure `heartless.teixit.operador_teixit`)
+    dt : float
+        Increment de temps normalitzat
+    """
+    if esquema == "implicit":
+        theta = 1.0
+    elif esquema == "crank":
+        theta = 0.5
+    else:
+        raise ValueError(f"Esquema desconegut: '{esquema}'")
+
+    diagonal = 1 - theta * dt * centre
+    if esquema == "crank":
+        # Els extrems són diferents, igual que amb els coeficients constants
+        diagonal[0] -= theta * dt * esq[0]
+        diagonal[-1] -= theta * dt * dreta[-1]
+    return -theta * dt * esq[1:], diagonal, -theta * dt * dreta[:-1]
+
+
+def factoritzacio_esquema(esquema: str, n: int, dx, dt: float) -> FactoritzacioTridiagonal:
+    """Factorització (en memòria cau) de la matriu de l'esquema per (N, dx, dt)
+
+    `dx` pot ser les posicions d'una malla no uniforme. Si l'operador no és constant
+    (malla no uniforme o teixit heterogeni), la clau de la memòria cau són els seus coeficients.
+    """
+    if operador_constant(dx):
+        return _factoritzacio_esquema(esquema, n, dx, dt)
+    esq, centre, dreta, _ = operador(dx)
+    return _factoritzacio_operador(
+        esquema, esq.tobytes(), centre.tobytes(), dreta.tobytes(), dt
+    )
+
+
+@lru_cache(maxsize=32)
+def _factoritzacio_esquema(
+    esquema: str, n: int, dx: float, dt: float
+) -> FactoritzacioTridiagonal:
+    return factoritza_tridiagonal(*diagonals_esquema(esquema, n, dx, dt))
+
+
+@lru_cache(maxsize=32)
+def _factoritzacio_operador(
+    esquema: str, esq: bytes, centre: bytes, dreta: bytes, dt: float
+) -> FactoritzacioTridiagonal:
+    esq, centre, dreta = (np.frombuffer(c, dtype=np.float64) for c in (esq, centre, dreta))
+    return factoritza_tridiagonal(*diagonals_operador(esquema, esq, centre, dreta, dt))
@@ -1,9 +1,11 @@
 import os
+from dataclasses import dataclass
 
 import numpy as np
 from numpy.typing import NDArray
 
 from heartless.configuracio import constants, settings
+from heartless.malla import fronteres_teixit, malla_configurada
 from heartless.normalitzacio import desnormalitza_distancia
 
 
@@ -11,13 +13,17 @@ def calcula_divisions() -> np.ndarray:
     """
     Coneixent que x està normalitzada i la quantitat de divisions (N), podem trobar dx i conseqüentment totes les posicions de la matriu $\\hat{x}$
 
+    Amb una malla no uniforme (`settings.malla`) són les posicions d'aquesta malla
+
     :return: Array amb tots els valors de $\\hat
     :rtype: ndarray[_AnyShape, dtype[float64]]
     """
-    return np.linspace(0, 1, constants.N, dtype=np.float64)
+    return malla_configurada()
 
 
-def guardar_matriu(matriu: np.ndarray, fitxer: str = "output") -> None:
+def guardar_matriu(
+    matriu: np.ndarray, fitxer: str = "output", x: np.ndarray | None = None
+) -> None:
     """
     Guarda matrius en csv, afegint com a columnes els intervals de x sense normalitzar
 
@@ -25,6 +31,8 @@ def guardar_matriu(matriu: np.ndarray, fitxer: str = "output") -> None:
     :type matriu: np.ndarray[(NxM),np.float64]
     :param fitxer: Nom del fitxer sense extensió
     :type fitxer: str
+    :param x: Posicions normalitzades de les columnes (per defecte `calcula_divisions()`)
+    :type x: np.ndarray | None
 
     """
 
@@ -40,7 +48,7 @@ def guardar_matriu(matriu: np.ndarray, fitxer: str = "output") -> None:
 
     # Creem l'informació necessària per guardar el csv
     directori_fitxer = os.path.join(directori_carpeta, fitxer + ".csv")
-    pos_x = desnormalitza_distancia(calcula_divisions())
+    pos_x = desnormalitza_distancia(calcula_divisions() if x is None else x)
     headers = ",".join(["%.17e" % nom for nom in pos_x])
 
     try:
@@ -57,6 +65,43 @@ def guardar_matriu(matriu: np.ndarray, fitxer: str = "output") -> None:
         print(f"Error inesperat: {e}")
 
 
+def guardar_files(files, fitxer: str = "output", x: np.ndarray | None = None) -> None:
+    """
+    Guarda en csv les files d'un iterador a mesura que es generen, amb el mateix format que `guardar_matriu`
+
+    Permet guardar el resultat d'un mètode sense tenir mai la matriu sencera en memòria
+
+    :param files: Iterador de files de temperatures
+    :type files: Iterable[np.ndarray[(N,),np.float64]]
+    :param fitxer: Nom del fitxer sense extensió
+    :type fitxer: str
+    :param x: Posicions normalitzades de les columnes (per defecte `calcula_divisions()`)
+    :type x: np.ndarray | None
+    """
+
+    directori_carpeta = os.path.join(os.getcwd(), settings.dades_path)
+
+    # Crea el directori de `dades` si no existeix
+    try:
+        os.makedirs(directori_carpeta, exist_ok=True)
+    except Exception as e:
+        print(f"Error creant el directori: {e}")
+        return
+
+    directori_fitxer = os.path.join(directori_carpeta, fitxer + ".csv")
+    pos_x = desnormalitza_distancia(calcula_divisions() if x is None else x)
+    headers = ",".join(["%.17e" % nom for nom in pos_x])
+
+    try:
+        with open(directori_fitxer, "w") as f:
+            f.write(headers + "\n")
+            for fila in files:
+                np.savetxt(f, fila[np.newaxis, :], fmt="%.17e", delimiter=",")
+        print("Guardat correctament")
+    except Exception as e:
+        print(f"Error inesperat: {e}")
+
+
 def carregar_posicions_temperatures(fitxer: str) -> tuple[np.ndarray, np.ndarray]:
     """Llegeix el fitxer (sense extensió de la carpeta de dades) i el retorna en el format personalitzat
 
@@ -114,6 +159,137 @@ def carregar_posicions_temperatures(fitxer: str) -> tuple[np.ndarray, np.ndarray
     return pos_x, matriu_temperatura
 
 
+def index_files_csv(fitxer: str) -> np.ndarray:
+    """Posició (en bytes) de l'inici de cada fila de dades d'un CSV de `dades/`
+
+    L'índex es guarda al costat del CSV (`<fitxer>.idx.npy`) i només es torna a calcular
+    si el CSV ha canviat. L'últim element és la mida del fitxer,
+    de manera que la fila `i` ocupa `[index[i], index[i+1])`.
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer dins de `dades/` (sense extensió `.csv`)
+
+    Returns
+    -------
+    np.ndarray
+        Posicions d'inici de cada fila (sense la capçalera) i la mida del fitxer
+    """
+    directori_carpeta = os.path.join(os.getcwd(), settings.dades_path)
+    fitxer_complet = os.path.join(directori_carpeta, fitxer + ".csv")
+    fitxer_index = os.path.join(directori_carpeta, fitxer + ".idx.npy")
+
+    mida = os.path.getsize(fitxer_complet)
+    if os.path.exists(fitxer_index) and os.path.getmtime(
+        fitxer_index
+    ) >= os.path.getmtime(fitxer_complet):
+        index = np.load(fitxer_index)
+        if len(index) and index[-1] == mida:
+            return index
+
+    # Recorrem el fitxer un sol cop guardant la longitud de cada línia
+    with open(fitxer_complet, "rb") as f:
+        longituds = [len(linia) for linia in f]
+    inicis = np.cumsum([0] + longituds, dtype=np.int64)
+    # La primera línia és la capçalera, no és una fila de dades
+    index = inicis[1:]
+
+    try:
+        np.save(fitxer_index, index)
+    except Exception as e:
+        print(f"Error guardant l'índex: {e}")
+    return index
+
+
+class MatriuCSV:
+    """Matriu de temperatures d'un CSV que només llegeix les files que s'indexen
+
+    Utilitza `index_files_csv` per anar directament a cada fila demanada,
+    així que llegir `T[-1]` o `T[[0, 10, 20], :]` no recorre tot el fitxer.
+    `np.asarray(T)` llegeix la matriu sencera.
+    """
+
+    def __init__(self, fitxer: str):
+        self.fitxer = fitxer
+        self.directori = os.path.join(
+            os.getcwd(), settings.dades_path, fitxer + ".csv"
+        )
+        self.index = index_files_csv(fitxer)
+        with open(self.directori, "r") as f:
+            self._n_columnes = len(f.readline().strip().split(","))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.index) - 1, self._n_columnes
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def llegeix_files(self, files) -> np.ndarray:
+        """Llegeix les files donades (índexs, poden ser negatius) com una matriu"""
+        files = np.arange(len(self))[files]
+        resultat = np.empty((len(files), self._n_columnes), dtype=np.float64)
+        with open(self.directori, "rb") as f:
+            for k, i in enumerate(files):
+                f.seek(self.index[i])
+                linia = f.read(self.index[i + 1] - self.index[i])
+                resultat[k] = np.array(linia.split(b","), dtype=np.float64)
+        return resultat
+
+    def __getitem__(self, clau):
+        if isinstance(clau, tuple):
+            files, columnes = clau[0], clau[1:]
+        else:
+            files, columnes = clau, ()
+
+        if isinstance(files, (int, np.integer)):
+            resultat = self.llegeix_files([files])[0]
+        else:
+            resultat = self.llegeix_files(files)
+            columnes = (slice(None),) + columnes
+        return resultat[columnes] if columnes else resultat
+
+    def __array__(self, dtype=None, copy=None):
+        matriu = self.llegeix_files(slice(None))
+        return matriu if dtype is None else matriu.astype(dtype)
+
+
+def files_per_fraccions(n_files: int, fraccions) -> list[int]:
+    """Índex de fila per cada fracció de `t_a` (0 és l'inici, 1 l'última fila)"""
+    return [max(0, min(int(n_files * q), n_files - 1)) for q in fraccions]
+
+
+def carregar_files_csv(fitxer: str, files) -> tuple[np.ndarray, np.ndarray]:
+    """Llegeix només les files demanades d'un CSV de `dades/`
+
+    Parameters
+    ----------
+    fitxer : str
+        Nom del fitxer dins de `dades/` (sense extensió `.csv`)
+    files : int | slice | list[int]
+        Files a llegir (per exemple `-1` per l'última o `files_per_fraccions(...)`)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Posicions x i les files de temperatures demanades
+    """
+    directori_carpeta = os.path.join(os.getcwd(), settings.dades_path)
+    fitxer_complet = os.path.join(directori_carpeta, fitxer + ".csv")
+    if not os.path.exists(fitxer_complet):
+        print(f"Error: El fitxer '{fitxer_complet}' no existeix.")
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+
+    with open(fitxer_complet, "r") as f:
+        pos_x = np.array(f.readline().strip().split(","), dtype=np.float64)
+    return pos_x, MatriuCSV(fitxer)[files]
+
+
 def gauss_pivotatge(matriu: NDArray, indep: NDArray) -> NDArray:
     """Resol el sistema: `matriu * x = indep` utilitzant el mètode de Gauss amb pivotatge total.
 
@@ -172,6 +348,83 @@ def gauss_pivotatge(matriu: NDArray, indep: NDArray) -> NDArray:
     return x_ordenat
 
 
+def arrel_brent(f, a: float, b: float, tol: float = 1e-12, max_iter: int = 100):
+    """Troba una arrel de `f` a l'interval [a, b] amb el mètode de Brent
+
+    Combina bisecció, secant i interpolació quadràtica inversa:
+    sempre manté l'arrel acotada i convergeix en poques avaluacions.
+
+    Parametres
+    ----------
+    f : Callable[[float], float]
+        Funció contínua
+    a, b : float
+        Extrems de l'interval, `f(a)` i `f(b)` han de tenir signes diferents
+    tol : float
+        Tolerància absoluta de l'arrel
+    max_iter : int
+        Nombre màxim d'iteracions
+
+    Retorna
+    -------
+    float | None
+        L'arrel, o None si `f` no canvia de signe a l'interval o no convergeix
+    """
+    fa, fb = f(a), f(b)
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    if (fa > 0) == (fb > 0):
+        return None
+
+    c, fc = b, fb
+    d = e = b - a
+    for _ in range(max_iter):
+        # `c` ha de quedar sempre a l'altra banda de l'arrel respecte `b`
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+        # `b` és sempre la millor aproximació
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        tol1 = 2 * np.finfo(np.float64).eps * abs(b) + 0.5 * tol
+        xm = 0.5 * (c - b)
+        if abs(xm) <= tol1 or fb == 0:
+            return b
+
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # Secant
+                p = 2 * xm * s
+                q = 1 - s
+            else:
+                # Interpolació quadràtica inversa
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * xm * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * xm * q - abs(tol1 * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                # La interpolació no millora prou, fem bisecció
+                d = e = xm
+        else:
+            d = e = xm
+
+        a, fa = b, fb
+        b += d if abs(d) > tol1 else np.copysign(tol1, xm)
+        fb = f(b)
+
+    return None
+
+
 def guarda_figura(fig, fitxer, **kwargs):
     """
     Saves a Matplotlib figure to the 'grafiques' directory, creating it if needed.
@@ -199,7 +452,110 @@ def error_relatiu(T_exp, T_an):
     return np.abs(T_exp - T_an) / T_an
 
 
-def troba_maxima_iter_temps(T) -> tuple[int, int]:
+def limits_teixit(n: int | None = None, x: np.ndarray | None = None) -> np.ndarray:
+    """Temperatura màxima permesa (ºC) a cada posició de la malla
+
+    - El teixit sa ha d'estar per sota de 50 ºC
+    - El teixit malalt ha d'estar per sota de 80 ºC
+
+    A la malla uniforme utilitza els mateixos índexs límit que `troba_maxima_iter_temps`.
+    En una malla no uniforme els índexs no diuen on és la frontera, i es decideix per la posició.
+
+    Parameters
+    ----------
+    n : int, optional
+        Nombre de posicions (per defecte constants.N)
+    x : np.ndarray, optional
+        Posicions normalitzades d'una malla no uniforme (veure `heartless.malla`)
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        Vector de mida `n` amb el límit de temperatura de cada posició
+    """
+    if x is not None:
+        x = np.asarray(x, dtype=np.float64)
+        esq, dret = fronteres_teixit()
+        return np.where((x < esq) | (x > dret), 50.0, 80.0)
+
+    if n is None:
+        n = constants.N
+    lim_esq = np.ceil(n * (constants.L - constants.l_mal) / (2 * constants.L))
+    lim_dret = n - lim_esq
+
+    j = np.arange(n)
+    sa = (j < lim_esq) | (j > lim_dret)
+    return np.where(sa, 50.0, 80.0)
+
+
+# Temperatura a partir de la qual considerem el teixit ablacionat (ºC)
+TEMP_ABLACIO = 50.0
+
+
+@dataclass(frozen=True)
+class AnalisiTeixit:
+    """Resultat de `analitza_teixit`
+
+    Attributes
+    ----------
+    primera_iteracio : int
+        Primera fila (iteració temporal) on algun punt supera el seu límit, -1 si cap
+    primera_posicio : int
+        Primera posició que supera el límit en aquesta fila, -1 si cap
+    max_sa : npt.NDArray[np.float64]
+        Temperatura màxima del teixit sa a cada iteració
+    max_malalt : npt.NDArray[np.float64]
+        Temperatura màxima del teixit malalt a cada iteració
+    fraccio_ablacio : npt.NDArray[np.float64]
+        Fracció del teixit malalt per sobre de `TEMP_ABLACIO` a cada iteració
+    """
+
+    primera_iteracio: int
+    primera_posicio: int
+    max_sa: np.ndarray
+    max_malalt: np.ndarray
+    fraccio_ablacio: np.ndarray
+
+
+def analitza_teixit(T, x: np.ndarray | None = None) -> AnalisiTeixit:
+    """Analitza una matriu (o vector) de temperatures en ºC respecte els límits del teixit
+
+    Tot es calcula amb màscares de NumPy, sense bucles de Python.
+    Un vector 1D es tracta com una matriu d'una sola fila.
+
+    Parameters
+    ----------
+    T : npt.NDArray
+        Temperatures (iteracions x posicions) o (posicions,)
+    x : npt.NDArray, optional
+        Posicions normalitzades si la malla no és uniforme (veure `limits_teixit`)
+
+    Returns
+    -------
+    AnalisiTeixit
+    """
+    T = np.atleast_2d(np.asarray(T, dtype=np.float64))
+    limits = limits_teixit(T.shape[1], x)
+    sa = limits == 50.0
+
+    superat = T > limits
+    files_superades = superat.any(axis=1)
+    if files_superades.any():
+        i = int(np.argmax(files_superades))
+        j = int(np.argmax(superat[i]))
+    else:
+        i, j = -1, -1
+
+    return AnalisiTeixit(
+        primera_iteracio=i,
+        primera_posicio=j,
+        max_sa=T[:, sa].max(axis=1),
+        max_malalt=T[:, ~sa].max(axis=1),
+        fraccio_ablacio=(T[:, ~sa] >= TEMP_ABLACIO).mean(axis=1),
+    )
+
+
+def troba_maxima_iter_temps(T, x: np.ndarray | None = None) -> tuple[int, int]:
     """Troba l'últim índex on es compleixen les següent condicions imposades:
     - El teixit sa ha d'estar per sota de 50 ºC
     - El teixit malalt ha d'estar per sota de 80 ªC
@@ -208,11 +564,15 @@ def troba_maxima_iter_temps(T) -> tuple[int, int]:
     Els index corresponent a aquests límits són: `i = N*(L-l)/(2L) ; j = N - i`
     on `i` es el límit esquerra, `j` es el límit dret
 
+    Utilitza `analitza_teixit`, que ho calcula tot amb màscares
+
 
     Parameters
     ----------
     T : npt.NDArray[2D matrix]
         Matriu corresponent a les temperatures
+    x : npt.NDArray, optional
+        Posicions normalitzades si la malla no és uniforme (veure `limits_teixit`)
 
     Returns
     -------
@@ -220,41 +580,14 @@ def troba_maxima_iter_temps(T) -> tuple[int, int]:
         Retorna l'últim índex que compleix les condicions
         i l'índex de la columna on s'ha trobat
     """
-    lim_esq = np.ceil(constants.N * (constants.L - constants.l_mal) / (2 * constants.L))
-    lim_dret = constants.N - lim_esq
-
-    rows = T.shape
-    if len(rows) == 1:
-        for j in range(rows[0]):
-            # Si el teixit està fora dels límits malalts (es teixit sa)
-            # limitem la temperatura a 50 ºC
-            if j < lim_esq or j > lim_dret:
-                if T[j] > 50:
-                    # ha trobat l'índex que no compleix, torna l'anterior
-                    return (
-                        0,
-                        j-1,
-                    )
-            # Si es teixit malalt, mirem que no superi 80 ºC
-            else:
-                if T[j] > 80:
-                    return 0, j-1
-        return 0,-1
-        
-    rows,cols = rows
-    for i in range(rows):
-        for j in range(cols):
-            # Si el teixit està fora dels límits malalts (es teixit sa)
-            # limitem la temperatura a 50 ºC
-            if j < lim_esq or j > lim_dret:
-                if T[i, j] > 50:
-                    # ha trobat l'índex que no compleix, torna l'anterior
-                    return (
-                        i - 1,
-                        j,
-                    )
-            # Si es teixit malalt, mirem que no superi 80 ºC
-            else:
-                if T[i, j] > 80:
-                    return i - 1, j
-    return rows, cols
+    analisi = analitza_teixit(T, x)
+    i, j = analisi.primera_iteracio, analisi.primera_posicio
+
+    if T.ndim == 1:
+        # En 1D retornem la posició anterior a la que no compleix (-1 si totes compleixen)
+        return (0, j - 1) if j != -1 else (0, -1)
+
+    if i == -1:
+        return T.shape
+    # ha trobat l'índex que no compleix, torna l'anterior
+    return i - 1, j
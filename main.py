@@ -1,10 +1,23 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-from heartless.analitica import fxt_t_determinat
+from heartless.adaptatiu import executa_sequencia_adaptativa
+from heartless.analitica import (
+    SolucioAnalitica,
+    cau_referencia,
+    fxt_t_determinat,
+    fxt_temps,
+    troba_temps_limit,
+)
 from heartless.configuracio import constants, settings
-from heartless.crank import crank_nicolson, executa_sequencia_crank_nicolson
-from heartless.explicit import euler_explicit, executa_sequencia_explicit
+from heartless.context import ContextExecucio
+from heartless.crank import executa_sequencia_crank_nicolson, itera_crank_nicolson
+from heartless.espectral import PropagadorEspectral
+from heartless.explicit import (
+    euler_explicit,
+    executa_sequencia_explicit,
+    itera_euler_explicit,
+)
 from heartless.grafiques import (
     configura_grafica,
     configura_limits_teixit,
@@ -12,29 +25,40 @@ from heartless.grafiques import (
     mapa_calor,
     plot_llista_temps,
 )
-from heartless.implicit import euler_implicit, executa_sequencia_implicit
+from heartless.implicit import executa_sequencia_implicit, itera_euler_implicit
+from heartless.malla import dx_configurat, pas_minim
+from heartless.memoria_cau import memoria_cau
+from heartless.monitor import limit_metode
+from heartless.newton import executa_sequencia_newton
 from heartless.normalitzacio import (
     desnormalitza_temperatura,
     desnormalitza_temps,
     normalitza_temps,
 )
+from heartless.richardson import executa_sequencia_richardson
+from heartless.teixit import es_homogeni
 from heartless.utils import (
-    carregar_posicions_temperatures,
     error_relatiu,
     guarda_figura,
-    troba_maxima_iter_temps,
 )
 
 plt.rcParams.update({"figure.figsize":(6,4)})
 
-def calcula_tots_metodes():
+def calcula_tots_metodes(context):
     # Calculem tots els mètodes per totes les dt
-    executa_sequencia_explicit()
-    executa_sequencia_implicit()
-    executa_sequencia_crank_nicolson()
-
-
-def grafiques_crank():
+    # Els resultats es queden al context i les gràfiques els llegeixen d'allà
+    executa_sequencia_explicit(context)
+    executa_sequencia_implicit(context)
+    executa_sequencia_crank_nicolson(context)
+    if settings.dt_adaptatiu:
+        executa_sequencia_adaptativa(context)
+    if settings.richardson:
+        executa_sequencia_richardson(context)
+    if settings.newton:
+        executa_sequencia_newton(context)
+
+
+def grafiques_crank(context):
     # Fem les grafiques corresponents al mètode de Crank-Nicolson
     fig = plt.figure()
     ax = fig.add_subplot(111)
@@ -54,13 +78,13 @@ def grafiques_crank():
 
     # Per cada dt diferent, llegim l'arxiu encarregat i fem la representació
     for item in constants.T_crank:
-        x, T_c = carregar_posicions_temperatures(f"{settings.fitxer_crank}_{item}")
+        x, T_c = context.obte(f"{settings.fitxer_crank}_{item}")
         plot_llista_temps(x, T_c, f"$\\Delta$t = {item}$\\Delta$x", ax)
     ax.legend()
     guarda_figura(fig, "crank")
 
 
-def grafiques_explicit():
+def grafiques_explicit(context):
     # El mateix que hem fet amb Crank-Nicolson ho executem amb Euler Explícit
     # A diferència de Crank-Nicolson, aquí separem en dues gràfiques:
     # aquells dt que convergeixen respecte els que divergeixen
@@ -83,7 +107,7 @@ def grafiques_explicit():
     ax1.plot(x * 100, T, label="Funció analítica")
 
     for item in constants.T_explicit:
-        x, T_c = carregar_posicions_temperatures(f"{settings.fitxer_explicit}_{item}")
+        x, T_c = context.obte(f"{settings.fitxer_explicit}_{item}")
         # Convergiran quan dt < 0.5 * dx**2
         if item < 0.5:
             plot_llista_temps(x, T_c, f"$\\Delta$t = {item}$\\Delta$x", ax1)
@@ -94,7 +118,7 @@ def grafiques_explicit():
     guarda_figura(fig1, "explicit-convergent")
     guarda_figura(fig2, "explicit-divergent")
 
-def grafiques_implicit():
+def grafiques_implicit(context):
     # Igual que amb els mètodes anteriors, fem la representació per cada valor de dt
     fig = plt.figure()
     ax = fig.add_subplot(111)
@@ -106,13 +130,13 @@ def grafiques_implicit():
     x, T = fxt_t_determinat(constants.t_a)
     ax.plot(x * 100, T, label="Funció analítica")
     for item in constants.T_implicit:
-        x, T_c = carregar_posicions_temperatures(f"{settings.fitxer_implicit}_{item}")
+        x, T_c = context.obte(f"{settings.fitxer_implicit}_{item}")
         plot_llista_temps(x, T_c, f"$\\Delta$t = {item}$\\Delta$x", ax)
     ax.legend()
     guarda_figura(fig, "implicit")
 
 
-def grafiques_conjunt():
+def grafiques_conjunt(context):
     # Finalment fem una gràfica conjunta de tots els mètodes,
     # utilitzant el dt més petit de cada mètode
     c_petit = min(constants.T_crank)
@@ -125,11 +149,11 @@ def grafiques_conjunt():
     ax.set_title("Comparació de tots els metodes per $\\Delta$t menor")
     configura_grafica(ax)
     configura_limits_teixit(ax)
-    x, T_e = carregar_posicions_temperatures(f"{settings.fitxer_explicit}_{e_petit}")
+    x, T_e = context.obte(f"{settings.fitxer_explicit}_{e_petit}")
     plot_llista_temps(x, T_e, "Explicit", ax)
-    x, T_i = carregar_posicions_temperatures(f"{settings.fitxer_implicit}_{i_petit}")
+    x, T_i = context.obte(f"{settings.fitxer_implicit}_{i_petit}")
     plot_llista_temps(x, T_i, "Implicit", ax)
-    x, T_c = carregar_posicions_temperatures(f"{settings.fitxer_crank}_{c_petit}")
+    x, T_c = context.obte(f"{settings.fitxer_crank}_{c_petit}")
     plot_llista_temps(x, T_c, "Crank-Nicolson", ax)
     x, T = fxt_t_determinat(constants.t_a)
     ax.plot(x * 100, T, label="Funció analítica")
@@ -137,7 +161,7 @@ def grafiques_conjunt():
     guarda_figura(fig, "conjunt")
 
 
-def grafiques_errors():
+def grafiques_errors(context):
     # Fem una gràfica dels errors relatius de cada mètode respecte el valor teòric
     # Només de les solucions que convergeixin
 
@@ -158,14 +182,14 @@ def grafiques_errors():
         ax.set_title(f"Comparació d'errors del mètode {llista_metodes[i]}")
         configura_grafica(ax)
         for q in llista_valors_q[i]:
-            x, T_c = carregar_posicions_temperatures(f"{llista_fitxers[i]}_{q}")
+            x, T_c = context.obte(f"{llista_fitxers[i]}_{q}")
             err_c = error_relatiu(T_c[-1], T_a)
             ax.plot(x * 100, err_c, label=f"$\\Delta$t = {q}($\\Delta$x)$^{{2}}$")
         ax.legend()
         guarda_figura(fig,f'error-{llista_metodes[i]}')
 
 
-def grafiques_animades():
+def grafiques_animades(context):
     # Aquí farem les animacions respecte el temps de:
     # - l'error relatiu
     # - l'increment de temperatura
@@ -176,7 +200,7 @@ def grafiques_animades():
         configura_grafica(ax2)
         print("Començant animació, tarda aproximadament 1 min 30 s")
 
-        x, T = carregar_posicions_temperatures(
+        x, T = context.obte(
             f"{settings.fitxer_explicit}_{min(constants.T_explicit)}"
         )
         dx = 1/(constants.N-1)
@@ -185,11 +209,9 @@ def grafiques_animades():
         T = desnormalitza_temperatura(T[[i for i in range(len(T)) if i % 4 == 0]])
         dt = dt*4
 
-        T_analitiques = []
-        for i in range(len(T)):
-            _, t_an = fxt_t_determinat(i * dt)
-            T_analitiques.append(error_relatiu(T[i],t_an))
-        T_err = np.array(T_analitiques)
+        # Tots els temps de la solució analítica en una sola crida
+        _, T_an = fxt_temps(np.arange(len(T)) * dt)
+        T_err = error_relatiu(T, T_an)
         # ax2.set_ylim(0,min(T_err[:-1].max()*1.01,0.006))
         create_animation_plot(
             fig2,
@@ -209,10 +231,11 @@ def grafiques_animades():
     configura_limits_teixit(ax2)
 
     print("Començant animació, tarda aproximadament 1 min 30 s")
-    x, T = carregar_posicions_temperatures(
+    x, T = context.obte(
         f"{settings.fitxer_explicit}_{min(constants.T_explicit)}"
     )
-    create_animation_plot(fig2, ax2, x * 100, T, save_name="anim_explicit")
+    # L'animació utilitza totes les files
+    create_animation_plot(fig2, ax2, x * 100, np.asarray(T), save_name="anim_explicit")
 
 
 def troba_limit_conjunt_metodes():
@@ -220,79 +243,77 @@ def troba_limit_conjunt_metodes():
     print("---- Temps màxim que compleix les condicions imposades ----")
     T_COS = 36
 
+    # Cada mètode amb el dt menor s'executa només fins que se supera algun límit:
+    # el monitor vigila cada iteració i interpola el temps exacte del creuament
+    dx = dx_configurat()
+    h = pas_minim(dx)
+    # (si les constants no han canviat, el resultat es llegeix de la memòria cau)
+    metodes = (
+        ("Temps Euler Explícit:", "explicit", itera_euler_explicit, constants.T_explicit),
+        ("Temps Euler Implícit:", "implicit", itera_euler_implicit, constants.T_implicit),
+        ("Temps Crank-Nicolson:", "crank", itera_crank_nicolson, constants.T_crank),
+    )
+    for etiqueta, nom, itera_metode, llista_q in metodes:
+        dt = h * h * min(llista_q)
+        limit = limit_metode(nom, itera_metode, dx, dt, T_COS)
+        result = desnormalitza_temps(limit.temps)
+        print(etiqueta, result)
 
-    # Obtenim la matriu de temperatures calculada amb el mètode explicit amb dt menor
-    dx = 1/(constants.N-1)
-    dt = dx * dx * min(constants.T_explicit)
-    T_ds = euler_explicit(dx,dt,T_COS)
-    T = desnormalitza_temperatura(T_ds)
-    # Obtenim l'última fila que compleix les condicions
-    i, _ = troba_maxima_iter_temps(T)
-    # Transformem d'índex a temps desnormalitzat utilitzant dt = q * dx**2
-    result = desnormalitza_temps(i * (1 / constants.N) ** 2 * min(constants.T_explicit))
-    print("Temps Euler Explícit:", result)
-
-    # Repetim el procediment del metode explícit per l'implícit
-    dt = dx * dx * min(constants.T_implicit)
-    T_ds = euler_implicit(dx,dt,T_COS)
-    T = desnormalitza_temperatura(T_ds)
-    # _, T = carregar_posicions_temperatures(
-    #     f"{settings.fitxer_implicit}_{min(constants.T_implicit)}"
-    # )
-    i, _ = troba_maxima_iter_temps(T)
-    result = desnormalitza_temps(i * (1 / constants.N) ** 2 * min(constants.T_implicit))
-    print("Temps Euler Implícit:", result)
-
-    # Repetim el procediment del metode explícit per Crank-Nicolson
-    dt = dx * dx * min(constants.T_crank)
-    T_ds = crank_nicolson(dx,dt,T_COS)
-    T = desnormalitza_temperatura(T_ds)
-    i, _ = troba_maxima_iter_temps(T)
-    result = desnormalitza_temps(i * (1 / constants.N) ** 2 * min(constants.T_crank))
-    print("Temps Crank-Nicolson:", result)
+    # La cerca analítica parteix del resultat de Crank-Nicolson (l'últim)
     res_nom = normalitza_temps(result)
-    pos_temps = np.linspace(res_nom*0.95,res_nom*1.05,200)
-    index = -1
-    for t in pos_temps:
-        _,T_res = fxt_t_determinat(t)
-        _,index = troba_maxima_iter_temps(T_res)
-        if index != -1:
-            print("Temps analític:      ",desnormalitza_temps(t))
-            break
-    if index == -1:
+    # Busquem el creuament analític al voltant del resultat de Crank-Nicolson,
+    # amb la mateixa temperatura del cos que els mètodes
+    t_limit = troba_temps_limit(
+        res_nom*0.95, res_nom*1.05, referencia=SolucioAnalitica(t_cos=T_COS)
+    )
+    if t_limit is not None:
+        print("Temps analític:      ",desnormalitza_temps(t_limit))
+    else:
         print("La solució analítica divergeix tant de la numèrica que no és un bon mètode")
-        
 
+    # Referència exacta de la discretització espacial (sense error temporal), amb la DST
+    # (només diagonalitza l'operador del teixit homogeni)
+    if es_homogeni():
+        t_limit = troba_temps_limit(
+            res_nom*0.95, res_nom*1.05, referencia=PropagadorEspectral(T_COS)
+        )
+        if t_limit is not None:
+            print("Temps discret exacte:",desnormalitza_temps(t_limit))
 
 
 def main():
     print("Començant simulació!")
-    calcula_tots_metodes()
+    context = ContextExecucio()
+    calcula_tots_metodes(context)
+    # Escrivim els resultats al disc una sola vegada
+    context.guarda()
 
     troba_limit_conjunt_metodes()
 
-    grafiques_explicit()
-    grafiques_implicit()
-    grafiques_crank()
+    grafiques_explicit(context)
+    grafiques_implicit(context)
+    grafiques_crank(context)
 
-    grafiques_conjunt()
+    grafiques_conjunt(context)
 
-    grafiques_errors()
+    grafiques_errors(context)
 
-    x, T = carregar_posicions_temperatures(
+    x, T = context.obte(
         f"{settings.fitxer_explicit}_{min(constants.T_explicit)}"
     )
-    fig_h, ax_h = mapa_calor(T, metode="Explícit")
+    fig_h, ax_h = mapa_calor(np.asarray(T), metode="Explícit")
     guarda_figura(fig_h, "mapa-calor")
 
     if settings.show_grafiques:
         plt.show()
 
-    grafiques_animades()
+    grafiques_animades(context)
 
     if settings.show_grafiques:
         plt.show()
 
+    print(memoria_cau.informe())
+    print(cau_referencia.informe())
     print("Simulació finalitzada correctament!!!")
 
 